@@ -70,6 +70,8 @@ class Content:
         self.hide()
         self._build_tab_panels()
         self._header.visible = True
+        if self._manage.zfs.backend == "cli":
+            await self._manage.zfs.check_connection()
         await self._manage.display_snapshots()
 
     def hide(self):
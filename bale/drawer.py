@@ -3,6 +3,7 @@ from nicegui import ui  # type: ignore
 from bale import elements as el
 from bale.tabs import Tab
 from bale.interfaces import ssh
+from bale.interfaces import sshpool
 import logging
 
 logger = logging.getLogger(__name__)
@@ -77,12 +78,14 @@ class Drawer(object):
 
     def _add_host_to_table(self, name):
         if len(name) > 0:
+            backend = Tab(spinner=None).backends.get(name, "cli")
+            if name not in Tab._zfs or Tab._zfs[name].backend != backend:
+                Tab.register_connection(name, backend=backend)
             for row in self._table.rows:
                 if name == row["name"]:
                     return
             self._table.add_rows({"name": name})
             self._table.visible = True
-            Tab.register_connection(name)
 
     async def _display_host_dialog(self, name=""):
         save = None
@@ -96,7 +99,7 @@ class Drawer(object):
                 el.notify(result.stderr.strip(), multi_line=True, type="negative")
 
         with ui.dialog() as host_dialog, el.Card():
-            with el.DBody(height="[560px]", width="[360px]"):
+            with el.DBody(height="[600px]", width="[360px]"):
                 with el.WColumn():
                     all_hosts = list(ssh.get_hosts())
                     if name != "":
@@ -105,6 +108,7 @@ class Drawer(object):
                     host_input = el.VInput(label="Host", value=" ", invalid_characters="""'`"$\\;&<>|(){} """, invalid_values=all_hosts, max_length=20)
                     hostname_input = el.VInput(label="Hostname", value=" ", invalid_characters="""!@#$%^&*'`"\\/:;<>|(){}=+[],? """)
                     username_input = el.DInput(label="Username", value=" ")
+                    backend_input = el.DSelect(["cli", "asyncssh"], value=Tab(spinner=None).backends.get(name, "cli"), label="Backend")
                     save_em = el.ErrorAggregator(host_input, hostname_input, username_input)
                     with el.Card() as c:
                         c.tailwind.width("full")
@@ -126,15 +130,22 @@ class Drawer(object):
 
         result = await host_dialog
         if result == "save":
+            if name != "":
+                await ssh.Ssh(name).close_connection()
+                sshpool.close(name)
             if name != "" and name != host_input.value:
                 default = Tab(spinner=None).common.get("default", "")
                 if default == name:
                     Tab(spinner=None).common["default"] = ""
                 ssh.Ssh(name).remove()
+                Tab(spinner=None).backends.pop(name, None)
+                Tab._zfs.pop(name, None)
                 for row in self._table.rows:
                     if name == row["name"]:
                         self._table.remove_rows(row)
             ssh.Ssh(host_input.value, hostname=hostname_input.value, username=username_input.value)
+            Tab(spinner=None).backends[host_input.value] = backend_input.value
+            Tab.register_connection(host_input.value, backend=backend_input.value)
             self._add_host_to_table(host_input.value)
 
     def _modify_host(self, mode):
@@ -167,7 +178,12 @@ class Drawer(object):
         if self._selection_mode == "remove":
             if len(e.selection) > 0:
                 for row in e.selection:
-                    ssh.Ssh(row["name"]).remove()
+                    connection = ssh.Ssh(row["name"])
+                    await connection.close_connection()
+                    sshpool.close(row["name"])
+                    connection.remove()
+                    Tab(spinner=None).backends.pop(row["name"], None)
+                    Tab._zfs.pop(row["name"], None)
                     self._table.remove_rows(row)
         self._modify_host(None)
 
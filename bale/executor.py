@@ -0,0 +1,199 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
+import asyncio
+import re
+import time
+from bale.interfaces.zfs import Ssh
+from bale.result import Result
+from bale.tabs import Task
+from bale import elements as el
+import logging
+
+logger = logging.getLogger(__name__)
+
+marker = "bale:batch"
+max_sessions: int = 10
+
+
+@dataclass(kw_only=True)
+class Batch:
+    tasks: List[Task] = field(default_factory=list)
+    command: str = ""
+
+
+def plan(tasks: List[Task], max_length: int = 4096) -> List[Batch]:
+    batches: List[Batch] = []
+    key: Union[Tuple[Any, ...], None] = None
+    for task in tasks:
+        operation = task.operation
+        if operation is not None and operation.batch_key is not None and operation.batch_key == key:
+            operations = [t.operation for t in batches[-1].tasks] + [operation]
+            command = type(operation).batch_command(operations)
+            if len(command) <= max_length:
+                batches[-1].tasks.append(task)
+                batches[-1].command = command
+                continue
+        key = operation.batch_key if operation is not None else None
+        batches.append(Batch(tasks=[task], command=task.command))
+    return batches
+
+
+def script(batches: List[Batch]) -> str:
+    if len(batches) == 1:
+        return batches[0].command
+    return "; ".join(f'{batch.command} 2>&1; echo "{marker}:{index}:$?"' for index, batch in enumerate(batches))
+
+
+def split_result(result: Result, batches: List[Batch]) -> List[Union[Result, None]]:
+    if len(batches) == 1:
+        return [result]
+    results: List[Union[Result, None]] = [None] * len(batches)
+    lines: List[str] = []
+    for line in result.stdout_lines:
+        matches = re.match(f"^{marker}:(?P<index>[0-9]+):(?P<return_code>[0-9]+)$", line.strip())
+        if matches is not None:
+            index = int(matches.group("index"))
+            results[index] = Result(
+                name=result.name,
+                command=batches[index].command,
+                return_code=int(matches.group("return_code")),
+                stdout_lines=lines,
+                timestamp=result.timestamp,
+            )
+            lines = []
+        else:
+            lines.append(line)
+    return results
+
+
+class TaskExecutor:
+    def __init__(
+        self,
+        connections: Dict[str, Ssh],
+        on_update: Callable[[Task, str, Union[Result, None], bool], Any],
+        limit: int = 1,
+        on_progress: Optional[Callable[["TaskExecutor"], Any]] = None,
+        max_length: int = 4096,
+        max_script_length: int = 32768,
+    ) -> None:
+        self._connections: Dict[str, Ssh] = connections
+        self._on_update: Callable[[Task, str, Union[Result, None], bool], Any] = on_update
+        self.limit: int = max(1, int(limit))
+        self._on_progress: Optional[Callable[["TaskExecutor"], Any]] = on_progress
+        self._max_length: int = max_length
+        self._max_script_length: int = max_script_length
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._runners: Dict[str, Ssh] = {}
+        self.total: int = 0
+        self.completed: int = 0
+        self.failed: int = 0
+        self.invocations: int = 0
+        self.started: float = 0
+        self.finished: float = 0
+
+    def _slot(self, host: str) -> asyncio.Semaphore:
+        if host not in self._slots:
+            connection = self._connections[host]
+            slots = min(self.limit, max(1, max_sessions - connection.max_concurrent))
+            self._slots[host] = asyncio.Semaphore(slots)
+            if slots > connection.max_concurrent:
+                self._runners[host] = Ssh(host, backend=connection.backend, max_concurrent=slots)
+            else:
+                self._runners[host] = connection
+        return self._slots[host]
+
+    def _scripts(self, batches: List[Batch]) -> List[List[Batch]]:
+        scripts: List[List[Batch]] = []
+        length = 0
+        for batch in batches:
+            if len(scripts) > 0 and length + len(batch.command) <= self._max_script_length:
+                scripts[-1].append(batch)
+                length += len(batch.command)
+            else:
+                scripts.append([batch])
+                length = len(batch.command)
+        return scripts
+
+    def _complete(self, task: Task, result: Union[Result, None], history: bool) -> None:
+        if result is not None and result.return_code == 0 and result.stdout == "" and result.stderr == "":
+            status = "success"
+        else:
+            status = "error"
+            self.failed += 1
+        self._on_update(task, status, result, history)
+        self.completed += 1
+
+    async def _execute(self, host: str, batches: List[Batch]) -> List[Result]:
+        async with self._slot(host):
+            try:
+                result = await self._runners[host].execute(script(batches))
+                self.invocations += 1
+                results = split_result(result, batches)
+            except Exception as e:
+                logger.exception(e)
+                result = Result(name=host, command=script(batches), return_code=None, trace=str(e))
+                results = [None] * len(batches)
+        return [result if batch_result is None else batch_result for batch_result in results]
+
+    async def _run_script(self, host: str, batches: List[Batch]) -> None:
+        for batch in batches:
+            for task in batch.tasks:
+                self._on_update(task, "running", None, False)
+        results = await self._execute(host, batches)
+        failed = [batch for batch, batch_result in zip(batches, results) if len(batch.tasks) > 1 and batch_result.return_code != 0]
+        failed_ids = {id(batch) for batch in failed}
+        if len(failed) > 0:
+            retries = [Batch(tasks=[task], command=task.command) for batch in failed for task in batch.tasks]
+            retried = iter(zip(retries, await self._execute(host, retries)))
+            pairs: List[Tuple[Batch, Result]] = []
+            for batch, batch_result in zip(batches, results):
+                if id(batch) in failed_ids:
+                    pairs.extend(next(retried) for _ in batch.tasks)
+                else:
+                    pairs.append((batch, batch_result))
+        else:
+            pairs = list(zip(batches, results))
+        for batch in batches:
+            for task in batch.tasks:
+                self._connections[host].invalidate_snapshots(task.filesystem)
+        for batch, batch_result in pairs:
+            if batch_result.return_code != 0 and batch_result.stdout != "":
+                el.notify(f"<{host}> {batch_result.stdout}", type="negative")
+            for index, task in enumerate(batch.tasks):
+                self._complete(task, batch_result, index == 0)
+        if self._on_progress is not None:
+            self._on_progress(self)
+
+    async def _run_chain(self, host: str, tasks: List[Task]) -> None:
+        for batches in self._scripts(plan(tasks, self._max_length)):
+            await self._run_script(host, batches)
+
+    async def run(self, tasks: List[Task]) -> None:
+        chains: Dict[Tuple[str, str], List[Task]] = {}
+        for task in tasks:
+            if task.status != "pending":
+                continue
+            if task.host in self._connections:
+                chains.setdefault((task.host, task.filesystem.split("/")[0]), []).append(task)
+            else:
+                logger.warning(f"Skipping task for unknown host {task.host}.")
+        self.total = sum(len(chain) for chain in chains.values())
+        self.completed = 0
+        self.failed = 0
+        self.invocations = 0
+        self.started = time.time()
+        self.finished = 0
+        await asyncio.gather(*[self._run_chain(host, chain) for (host, _), chain in chains.items()])
+        self.finished = time.time()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.started if self.started > 0 else 0
+
+    @property
+    def throughput(self) -> float:
+        return self.completed / self.elapsed if self.elapsed > 0 else 0
+
+    @property
+    def progress(self) -> str:
+        return f"{self.completed}/{self.total} tasks, {self.invocations} invocations, {self.throughput:.1f}/s"
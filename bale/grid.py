@@ -0,0 +1,209 @@
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+import asyncio
+import json
+from nicegui import app, context, Client  # type: ignore
+import logging
+
+logger = logging.getLogger(__name__)
+
+sources: Dict[str, Callable[[], List[Any]]] = {}
+_views: Dict[str, Tuple[str, str, List[Any]]] = {}
+_generations: Dict[str, int] = {}
+_clients: Dict[str, Set[str]] = {}
+
+
+def datasource(source: str) -> str:
+    return f"""{{
+        getRows: (params) => {{
+            const query = new URLSearchParams({{
+                start: params.startRow,
+                end: params.endRow,
+                sort: JSON.stringify(params.sortModel),
+                filter: JSON.stringify(params.filterModel),
+            }});
+            fetch(`/grid/{source}?${{query}}`)
+                .then((response) => response.json())
+                .then((data) => params.successCallback(data.rows, data.lastRow))
+                .catch(() => params.failCallback());
+        }},
+    }}"""
+
+
+def register_source(name: str, rows: Callable[[], List[Any]], client: Optional[Client] = None) -> str:
+    client = client if client is not None else context.get_client()
+    source = f"{name}-{client.id}"
+    sources[source] = rows
+    invalidate_source(source)
+    if client.id not in _clients:
+        _clients[client.id] = set()
+        client.on_disconnect(lambda: _drop_client(client.id))
+    _clients[client.id].add(source)
+    return source
+
+
+def unregister_source(source: str) -> None:
+    sources.pop(source, None)
+    _views.pop(source, None)
+    _generations.pop(source, None)
+    for client_sources in _clients.values():
+        client_sources.discard(source)
+
+
+def _drop_client(client_id: str) -> None:
+    for source in _clients.pop(client_id, set()):
+        unregister_source(source)
+
+
+def _value(row: Any, field: str) -> Any:
+    if isinstance(row, dict):
+        return row.get(field)
+    return getattr(row, field, None)
+
+
+def _to_dict(row: Any) -> Dict[str, Any]:
+    if isinstance(row, dict):
+        return row
+    return row.to_dict()
+
+
+def _match_condition(value: Any, condition: Dict[str, Any]) -> bool:
+    kind = condition.get("type", "contains")
+    if kind == "blank":
+        return value is None or value == ""
+    if kind == "notBlank":
+        return value is not None and value != ""
+    if condition.get("filterType") == "number":
+        try:
+            value = float(value)
+            target = float(condition.get("filter"))
+        except (TypeError, ValueError):
+            return False
+        if kind == "equals":
+            return value == target
+        if kind == "notEqual":
+            return value != target
+        if kind == "lessThan":
+            return value < target
+        if kind == "lessThanOrEqual":
+            return value <= target
+        if kind == "greaterThan":
+            return value > target
+        if kind == "greaterThanOrEqual":
+            return value >= target
+        if kind == "inRange":
+            return target <= value <= float(condition.get("filterTo", target))
+        return True
+    text = str(value if value is not None else "").lower()
+    target = str(condition.get("filter", "")).lower()
+    if kind == "equals":
+        return text == target
+    if kind == "notEqual":
+        return text != target
+    if kind == "contains":
+        return target in text
+    if kind == "notContains":
+        return target not in text
+    if kind == "startsWith":
+        return text.startswith(target)
+    if kind == "endsWith":
+        return text.endswith(target)
+    return True
+
+
+def _match(value: Any, model: Dict[str, Any]) -> bool:
+    if "conditions" in model:
+        matches = [_match_condition(value, {"filterType": model.get("filterType"), **condition}) for condition in model["conditions"]]
+        return all(matches) if model.get("operator", "AND") == "AND" else any(matches)
+    return _match_condition(value, model)
+
+
+def filter_rows(rows: List[Any], filter_model: Dict[str, Dict[str, Any]]) -> List[Any]:
+    for field, model in filter_model.items():
+        rows = [row for row in rows if _match(_value(row, field), model)]
+    return rows
+
+
+def sort_rows(rows: List[Any], sort_model: List[Dict[str, str]]) -> List[Any]:
+    for sort in reversed(sort_model):
+        field = sort["colId"]
+        rows = sorted(rows, key=lambda row: (_value(row, field) is None, _value(row, field)), reverse=sort.get("sort") == "desc")
+    return rows
+
+
+def _view(rows: List[Any], sort: str, filter: str) -> List[Any]:
+    return sort_rows(filter_rows(rows, json.loads(filter)), json.loads(sort))
+
+
+@app.get("/grid/{source}")
+async def grid_rows(source: str, start: int = 0, end: int = 100, sort: str = "[]", filter: str = "{}") -> Dict[str, Union[List[Dict[str, Any]], int]]:
+    if source not in sources:
+        return {"rows": [], "lastRow": 0}
+    view = _views.get(source)
+    if view is not None and view[0] == sort and view[1] == filter:
+        result = view[2]
+    else:
+        generation = _generations.get(source, 0)
+        try:
+            result = await asyncio.to_thread(_view, list(sources[source]()), sort, filter)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Invalid grid request for {source}: {e}")
+            return {"rows": [], "lastRow": 0}
+        if source in sources and _generations.get(source, 0) == generation:
+            _views[source] = (sort, filter, result)
+    return {"rows": [_to_dict(row) for row in result[start:end]], "lastRow": len(result)}
+
+
+def invalidate_source(source: str) -> None:
+    _views.pop(source, None)
+    _generations[source] = _generations.get(source, 0) + 1
+
+
+def server_side(aggrid: Any, source: str) -> None:
+    invalidate_source(source)
+    aggrid.options.pop(":getRowId", None)
+    if aggrid.options.get("rowModelType") == "infinite":
+        aggrid.call_api_method("refreshInfiniteCache")
+    else:
+        aggrid.options.pop("rowData", None)
+        aggrid.options["rowModelType"] = "infinite"
+        aggrid.options["cacheBlockSize"] = 100
+        aggrid.options[":datasource"] = datasource(source)
+        aggrid.update()
+
+
+class Delta:
+    def __init__(self, *fields: str) -> None:
+        self._fields: Tuple[str, ...] = fields
+        self._rows: Union[Dict[str, Dict[str, Any]], None] = None
+        self.stats: Dict[str, int] = {"full": 0, "transactions": 0, "rows_sent": 0}
+
+    def _key(self, row: Dict[str, Any]) -> str:
+        return "@".join("" if row.get(field) is None else str(row.get(field)) for field in self._fields)
+
+    @property
+    def row_id(self) -> str:
+        return f"""(params) => [{", ".join(f"params.data.{field}" for field in self._fields)}].join("@")"""
+
+    def reset(self) -> None:
+        self._rows = None
+
+    def apply(self, aggrid: Any, rows: List[Dict[str, Any]]) -> None:
+        current = {self._key(row): row for row in rows}
+        if self._rows is None or aggrid.options.get(":getRowId") != self.row_id or aggrid.options.get("rowModelType") == "infinite":
+            for option in ["rowModelType", "cacheBlockSize", ":datasource"]:
+                aggrid.options.pop(option, None)
+            aggrid.options[":getRowId"] = self.row_id
+            aggrid.options["rowData"] = rows
+            aggrid.update()
+            self.stats["full"] += 1
+            self.stats["rows_sent"] += len(rows)
+        else:
+            add = [row for key, row in current.items() if key not in self._rows]
+            remove = [row for key, row in self._rows.items() if key not in current]
+            update = [row for key, row in current.items() if key in self._rows and self._rows[key] != row]
+            aggrid.options["rowData"] = rows
+            if len(add) + len(remove) + len(update) > 0:
+                aggrid.call_api_method("applyTransaction", {"add": add, "remove": remove, "update": update})
+                self.stats["transactions"] += 1
+                self.stats["rows_sent"] += len(add) + len(remove) + len(update)
+        self._rows = {key: dict(row) for key, row in current.items()}
@@ -0,0 +1,335 @@
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import asyncio
+import bisect
+import os
+import re
+import shlex
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from bale.result import Result
+from bale.interfaces.zfs import Ssh, chunk_arguments, format_bytes
+from bale import elements as el
+import logging
+
+logger = logging.getLogger(__name__)
+
+_locks: Dict[str, asyncio.Lock] = {}
+
+schema = [
+    """CREATE TABLE IF NOT EXISTS snapshots (
+        filesystem TEXT NOT NULL,
+        name TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        creation INTEGER NOT NULL,
+        alive INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (filesystem, name)
+    )""",
+    """CREATE TABLE IF NOT EXISTS files (
+        filesystem TEXT NOT NULL,
+        directory TEXT NOT NULL,
+        name TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        first INTEGER NOT NULL,
+        last INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS files_name ON files (filesystem, name)",
+    "CREATE INDEX IF NOT EXISTS files_last ON files (filesystem, last, directory, name)",
+]
+
+
+def decode_path(path: str) -> str:
+    decoded = re.sub(r"\\(0[0-7]{3})", lambda m: chr(int(m.group(1), 8)), path)
+    try:
+        return decoded.encode("latin-1").decode("utf-8")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return decoded
+
+
+def split_path(path: str) -> Tuple[str, str]:
+    directory, _, name = path.strip("/").rpartition("/")
+    return directory, name
+
+
+class Catalog:
+    def __init__(self, zfs: Ssh, path: str = "data") -> None:
+        self._zfs: Ssh = zfs
+        self._path: str = f"{Path(path).resolve()}/catalog"
+        self.db_path: str = f"{self._path}/{zfs.host}.sqlite"
+        self.batch_size: int = 5000
+        self.max_arguments_length: int = 32768
+        self._ready: bool = False
+        self.stats: Dict[str, int] = {"baselines": 0, "diffs": 0, "files": 0}
+
+    @property
+    def host(self) -> str:
+        return self._zfs.host
+
+    def _transaction(self, work: Callable[[sqlite3.Connection], Any]) -> Any:
+        if self._ready is False:
+            os.makedirs(self._path, exist_ok=True)
+        connection = sqlite3.connect(self.db_path)
+        try:
+            with connection:
+                if self._ready is False:
+                    for statement in schema:
+                        connection.execute(statement)
+                    self._ready = True
+                return work(connection)
+        finally:
+            connection.close()
+
+    async def _db(self, work: Callable[[sqlite3.Connection], Any]) -> Any:
+        return await asyncio.to_thread(self._transaction, work)
+
+    async def _insert(self, filesystem: str, seq: int, files: List[Tuple[str, str, int, float]]) -> None:
+        rows = [(filesystem, directory, name, size, mtime, seq, seq) for directory, name, size, mtime in files]
+        await self._db(lambda c: c.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows))
+        self.stats["files"] += len(rows)
+
+    async def _baseline(self, filesystem: str, mountpoint: str, snapshot: str, seq: int) -> bool:
+        root = f"{mountpoint}/.zfs/snapshot/{snapshot}"
+        stream = self._zfs.stream(f"find {shlex.quote(root)} -type f -printf '%P\\t%s\\t%T@\\n'")
+        files: List[Tuple[str, str, int, float]] = []
+        async with stream:
+            async for line in stream:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) == 3:
+                    directory, name = split_path(fields[0])
+                    files.append((directory, name, int(fields[1]), float(fields[2])))
+                    if len(files) >= self.batch_size:
+                        await self._insert(filesystem, seq, files)
+                        files = []
+        await self._insert(filesystem, seq, files)
+        if stream.result is None or stream.result.return_code != 0:
+            await self._db(lambda c: c.execute("DELETE FROM files WHERE filesystem = ? AND first >= ?", (filesystem, seq)))
+            stderr = stream.result.stderr if stream.result is not None else ""
+            el.notify(f"<{self._zfs.host}> Unable to catalog {filesystem}@{snapshot}: {stderr}", type="negative")
+            return False
+        self.stats["baselines"] += 1
+        return True
+
+    async def _stat(self, root: str, paths: List[str], recursive: bool = False) -> List[Tuple[str, str, int, float]]:
+        files: List[Tuple[str, str, int, float]] = []
+        depth = "" if recursive else " -maxdepth 0"
+        for chunk in chunk_arguments([shlex.quote(f"{root}/{path}") for path in paths], self.max_arguments_length):
+            stream = self._zfs.stream(f"find {' '.join(chunk)}{depth} -type f -printf '%p\\t%s\\t%T@\\n'")
+            async with stream:
+                async for line in stream:
+                    fields = line.rstrip("\n").split("\t")
+                    if len(fields) == 3 and fields[0].startswith(f"{root}/"):
+                        directory, name = split_path(fields[0][len(root) :])
+                        files.append((directory, name, int(fields[1]), float(fields[2])))
+        return files
+
+    async def _diff(self, filesystem: str, mountpoint: str, previous: str, snapshot: str, previous_seq: int, seq: int) -> bool:
+        stream = self._zfs.stream(f"zfs diff -FHt {filesystem}@{previous} {filesystem}@{snapshot}")
+        closed: List[Tuple[str, str]] = []
+        changed: List[str] = []
+        moved: List[str] = []
+        renamed: List[str] = []
+        prefix = mountpoint.rstrip("/")
+        async with stream:
+            async for line in stream:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) < 4:
+                    continue
+                paths = [decode_path(path)[len(prefix) :].lstrip("/") for path in fields[3:]]
+                if fields[2] == "/" and fields[1] == "R" and len(paths) > 1:
+                    moved.append(paths[0])
+                    renamed.append(paths[1])
+                if fields[2] != "F":
+                    continue
+                if fields[1] in ["-", "M", "R"]:
+                    closed.append(split_path(paths[0]))
+                if fields[1] in ["+", "M"]:
+                    changed.append(paths[0])
+                elif fields[1] == "R" and len(paths) > 1:
+                    changed.append(paths[1])
+        if stream.result is None or stream.result.return_code != 0:
+            stderr = stream.result.stderr if stream.result is not None else ""
+            el.notify(f"<{self._zfs.host}> Unable to diff {filesystem}@{previous} {filesystem}@{snapshot}: {stderr}", type="negative")
+            return False
+        root = f"{mountpoint}/.zfs/snapshot/{snapshot}"
+        found = await self._stat(root, changed) + await self._stat(root, renamed, recursive=True)
+        files = list({(directory, name): (directory, name, size, mtime) for directory, name, size, mtime in found}.values())
+
+        def apply(c: sqlite3.Connection) -> None:
+            c.execute("UPDATE files SET last = ? WHERE filesystem = ? AND last = ?", (seq, filesystem, previous_seq))
+            c.executemany("UPDATE files SET last = ? WHERE filesystem = ? AND last = ? AND directory = ? AND name = ?", [(previous_seq, filesystem, seq, d, n) for d, n in closed])
+            c.executemany(
+                "UPDATE files SET last = ? WHERE filesystem = ? AND last = ? AND (directory = ? OR substr(directory, 1, ?) = ?)",
+                [(previous_seq, filesystem, seq, directory, len(directory) + 1, f"{directory}/") for directory in moved],
+            )
+            for directory, name, size, mtime in files:
+                reopened = c.execute(
+                    "UPDATE files SET last = ? WHERE filesystem = ? AND last = ? AND directory = ? AND name = ? AND size = ? AND mtime = ?",
+                    (seq, filesystem, previous_seq, directory, name, size, mtime),
+                )
+                if reopened.rowcount == 0:
+                    c.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", (filesystem, directory, name, size, mtime, seq, seq))
+
+        await self._db(apply)
+        self.stats["diffs"] += 1
+        self.stats["files"] += len(files)
+        return True
+
+    async def _mountpoint(self, filesystem: str) -> Optional[str]:
+        filesystems = await self._zfs.filesystems
+        mountpoint = filesystems.data.get(filesystem, {}).get("mountpoint")
+        if mountpoint is None or not mountpoint.startswith("/"):
+            return None
+        return mountpoint
+
+    async def update(self, filesystem: str, progress: Optional[Callable[[int, int], Any]] = None) -> Result:
+        lock = _locks.setdefault(f"{self._zfs.host}:{filesystem}", asyncio.Lock())
+        async with lock:
+            mountpoint = await self._mountpoint(filesystem)
+            if mountpoint is None:
+                return Result(name=self._zfs.host, return_code=1, trace=f"{filesystem} is not mounted.", data=0)
+            snapshots = await self._zfs.snapshots
+            records = sorted((record for record in snapshots.data.values() if record.filesystem == filesystem), key=lambda record: record.creation)
+            names = {record.name for record in records}
+            known: Dict[str, Tuple[int, int]] = await self._db(
+                lambda c: {name: (seq, creation) for name, seq, creation in c.execute("SELECT name, seq, creation FROM snapshots WHERE filesystem = ?", (filesystem,))}
+            )
+            dead = [(filesystem, name) for name in known if name not in names]
+            if len(dead) > 0:
+                await self._db(lambda c: c.executemany("UPDATE snapshots SET alive = 0 WHERE filesystem = ? AND name = ?", dead))
+            head: Tuple[Optional[str], int, int] = (None, 0, 0)
+            if len(known) > 0:
+                name, (seq, creation) = max(known.items(), key=lambda item: item[1][0])
+                head = (name, seq, creation)
+            added = 0
+            pending = [record for record in records if record.name not in known and record.creation >= head[2]]
+            for record in pending:
+                head_name, head_seq, _ = head
+                if progress is not None:
+                    progress(added, len(pending))
+                seq = head_seq + 1
+                await self._db(lambda c: c.execute("DELETE FROM files WHERE filesystem = ? AND first >= ?", (filesystem, seq)))
+                if head_name is None or head_name not in names:
+                    completed = await self._baseline(filesystem, mountpoint, record.name, seq)
+                else:
+                    completed = await self._diff(filesystem, mountpoint, head_name, record.name, head_seq, seq)
+                if completed is False:
+                    break
+                await self._db(lambda c: c.execute("INSERT INTO snapshots VALUES (?, ?, ?, ?, 1)", (filesystem, record.name, seq, record.creation)))
+                head = (record.name, seq, record.creation)
+                added += 1
+            if len(dead) > 0:
+                await self._db(
+                    lambda c: c.execute(
+                        """DELETE FROM files WHERE filesystem = ? AND NOT EXISTS (
+                            SELECT 1 FROM snapshots s WHERE s.filesystem = files.filesystem AND s.alive = 1 AND s.seq BETWEEN files.first AND files.last
+                        )""",
+                        (filesystem,),
+                    )
+                )
+        return Result(name=self._zfs.host, data=added)
+
+    def _connect(self) -> sqlite3.Connection:
+        self._transaction(lambda c: None)
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+    async def iter_search(self, filesystem: str, pattern: str, batch_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        mountpoint = await self._mountpoint(filesystem)
+        if mountpoint is None:
+            return
+        connection = await asyncio.to_thread(self._connect)
+        try:
+            alive = await asyncio.to_thread(lambda: connection.execute("SELECT seq, name FROM snapshots WHERE filesystem = ? AND alive = 1 ORDER BY seq", (filesystem,)).fetchall())
+            seqs = [seq for seq, _ in alive]
+            cursor = await asyncio.to_thread(
+                connection.execute,
+                "SELECT directory, name, size, mtime, first, last FROM files WHERE filesystem = ? AND name GLOB ? ORDER BY directory, name, first",
+                (filesystem, pattern),
+            )
+            while True:
+                files = await asyncio.to_thread(cursor.fetchmany, batch_size)
+                if len(files) == 0:
+                    break
+                rows = []
+                for directory, name, size, mtime, first, last in files:
+                    start = bisect.bisect_left(seqs, first)
+                    end = bisect.bisect_right(seqs, last)
+                    if start == end:
+                        continue
+                    location = f"{mountpoint}/.zfs/snapshot/{alive[end - 1][1]}/{directory}".rstrip("/")
+                    rows.append(
+                        {
+                            "host": self.host,
+                            "filesystem": filesystem,
+                            "relative": f"{directory}/{name}".lstrip("/"),
+                            "name": name,
+                            "location": location,
+                            "path": f"{location}/{name}",
+                            "bytes": size,
+                            "size": format_bytes(size),
+                            "modified_timestamp": mtime,
+                            "modified_datetime": datetime.fromtimestamp(mtime).strftime("%Y/%m/%d %H:%M:%S"),
+                            "snapshots": end - start,
+                            "first_snapshot": alive[start][1],
+                            "last_snapshot": alive[end - 1][1],
+                        }
+                    )
+                yield rows
+        finally:
+            connection.close()
+
+
+async def search_all(
+    targets: List[Tuple[Catalog, str]],
+    pattern: str,
+    per_host: int = 2,
+    progress: Optional[Callable[[int, int], Any]] = None,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    queue: asyncio.Queue = asyncio.Queue(maxsize=per_host * 4)
+    slots: Dict[str, asyncio.Semaphore] = {}
+    done = 0
+
+    async def search(catalog: Catalog, filesystem: str) -> None:
+        nonlocal done
+        if catalog.host not in slots:
+            slots[catalog.host] = asyncio.Semaphore(per_host)
+        async with slots[catalog.host]:
+            try:
+                updated = await catalog.update(filesystem)
+                if updated.return_code == 0:
+                    async for batch in catalog.iter_search(filesystem, pattern):
+                        await queue.put(batch)
+            except Exception as e:
+                logger.exception(e)
+                el.notify(f"<{catalog.host}> Unable to search {filesystem}: {e}", type="negative")
+        done += 1
+        if progress is not None:
+            progress(done, len(targets))
+
+    async def produce() -> None:
+        try:
+            await asyncio.gather(*[search(catalog, filesystem) for catalog, filesystem in targets])
+        except Exception as e:
+            logger.exception(e)
+        await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    seen: Dict[Tuple[str, int, float], Dict[str, Any]] = {}
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                break
+            rows = []
+            for row in batch:
+                key = (row["relative"], row["bytes"], row["modified_timestamp"])
+                if key in seen:
+                    seen[key]["snapshots"] += row["snapshots"]
+                    seen[key]["copies"] += 1
+                else:
+                    row["copies"] = 1
+                    seen[key] = row
+                    rows.append(row)
+            yield rows
+    finally:
+        producer.cancel()
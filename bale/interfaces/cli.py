@@ -1,8 +1,14 @@
-from typing import Dict, List, Union
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Deque, Dict, IO, Iterator, List, Optional, Union
 import asyncio
 from asyncio.subprocess import Process, PIPE
+from collections import deque
 import contextlib
+import gzip
+import os
+from pathlib import Path
 import shlex
+import time
+import uuid
 from datetime import datetime
 from nicegui import ui  # type: ignore
 from bale.result import Result
@@ -27,17 +33,299 @@ class Terminal(ui.element, component="../../static/terminal.js", libraries=["../
         self.run_method("call_api_method", name, *args)
 
 
+terminal_stats: Dict[str, int] = {"frames": 0, "bytes": 0, "dropped": 0}
+
+
+class Fanout:
+    interval: float = 0.05
+    max_frame_size: int = 16384
+    max_pending_size: int = 1048576
+    max_backlog_lines: int = 1000
+
+    def __init__(self) -> None:
+        self.terminals: List[Terminal] = []
+        self._pending: Deque[str] = deque()
+        self._pending_size: int = 0
+        self._dropped: int = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def __contains__(self, terminal: Terminal) -> bool:
+        return terminal in self.terminals
+
+    def _send(self, terminals: List[Terminal], frame: str) -> None:
+        for terminal in terminals:
+            terminal.call_terminal_method("write", frame)
+        terminal_stats["frames"] += len(terminals)
+        terminal_stats["bytes"] += len(frame.encode("utf-8")) * len(terminals)
+
+    def _frame(self) -> str:
+        parts: List[str] = []
+        size = 0
+        if self._dropped > 0:
+            parts.append(f"\n[... {self._dropped} characters skipped ...]\n")
+            self._dropped = 0
+        while len(self._pending) > 0 and size < self.max_frame_size:
+            chunk = self._pending.popleft()
+            room = self.max_frame_size - size
+            if len(chunk) > room:
+                self._pending.appendleft(chunk[room:])
+                chunk = chunk[:room]
+            parts.append(chunk)
+            size += len(chunk)
+            self._pending_size -= len(chunk)
+        return "".join(parts)
+
+    async def _drain(self) -> None:
+        while len(self._pending) > 0:
+            await asyncio.sleep(self.interval)
+            if len(self._pending) > 0:
+                self._send(self.terminals, self._frame())
+
+    def write(self, text: str) -> None:
+        if len(self.terminals) == 0:
+            return
+        self._pending.append(text)
+        self._pending_size += len(text)
+        while self._pending_size > self.max_pending_size and len(self._pending) > 1:
+            dropped = self._pending.popleft()
+            self._pending_size -= len(dropped)
+            self._dropped += len(dropped)
+            terminal_stats["dropped"] += len(dropped)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+
+    def flush(self) -> None:
+        while len(self._pending) > 0:
+            self._send(self.terminals, self._frame())
+
+    def _backlog(self, backlog: List[str]) -> str:
+        if len(backlog) > self.max_backlog_lines:
+            head = self.max_backlog_lines // 2
+            tail = self.max_backlog_lines - head
+            backlog = backlog[:head] + [f"... {len(backlog) - head - tail} lines omitted ...\n"] + backlog[-tail:]
+        frame = "".join(backlog)
+        if len(frame) > self.max_pending_size:
+            frame = f"[... {len(frame) - self.max_pending_size} characters skipped ...]\n" + frame[-self.max_pending_size :]
+        return frame
+
+    def add(self, terminal: Terminal, backlog: List[str]) -> None:
+        if terminal not in self.terminals:
+            self.flush()
+            frame = self._backlog(backlog)
+            if frame != "":
+                self._send([terminal], frame)
+            self.terminals.append(terminal)
+
+    def remove(self, terminal: Terminal) -> None:
+        if terminal in self.terminals:
+            self.terminals.remove(terminal)
+        if len(self.terminals) == 0:
+            self._pending.clear()
+            self._pending_size = 0
+            self._dropped = 0
+
+
+class LogSpill:
+    max_pending_lines: int = 1000
+
+    def __init__(self, path: str) -> None:
+        self._file: IO[str] = gzip.open(path, "wt", encoding="utf-8")
+        self._pending: List[str] = []
+
+    def write(self, line: str) -> None:
+        self._pending.append(line)
+        if len(self._pending) >= self.max_pending_lines:
+            self.flush()
+
+    def flush(self) -> None:
+        if len(self._pending) > 0:
+            self._file.write("".join(self._pending))
+            self._pending.clear()
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+
+class OutputBuffer:
+    def __init__(self, head: int = 0, tail: int = 0, log: Optional[LogSpill] = None, log_path: str = "") -> None:
+        self.head: int = head
+        self._head: List[str] = []
+        self._tail: Deque[str] = deque(maxlen=tail if tail > 0 else None)
+        self._log: Optional[LogSpill] = log
+        self._log_path: str = log_path
+        self.count: int = 0
+
+    @property
+    def bounded(self) -> bool:
+        return self._tail.maxlen is not None
+
+    @property
+    def omitted(self) -> int:
+        return self.count - len(self._head) - len(self._tail)
+
+    def append(self, line: str) -> None:
+        self.count += 1
+        if self._log is not None:
+            self._log.write(line)
+        if self.bounded and len(self._head) < self.head:
+            self._head.append(line)
+        else:
+            self._tail.append(line)
+
+    @property
+    def lines(self) -> List[str]:
+        if self.omitted > 0:
+            location = f", full output in {self._log_path}" if self._log_path != "" else ""
+            return self._head + [f"... {self.omitted} lines omitted{location} ...\n"] + list(self._tail)
+        return self._head + list(self._tail)
+
+    def clear(self) -> None:
+        self._head.clear()
+        self._tail.clear()
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.lines)
+
+
+class Invocation:
+    def __init__(self, command: str, max_output_lines: int = 0, capture_lines: int = 0, log_path: str = "", stderr_capture_lines: Optional[int] = None) -> None:
+        self.command: str = command
+        self.log_path: str = log_path
+        self._log: Optional[LogSpill] = LogSpill(log_path) if log_path != "" else None
+        stderr_capture_lines = capture_lines if stderr_capture_lines is None else stderr_capture_lines
+        self.stdout: OutputBuffer = OutputBuffer(head=capture_lines // 2, tail=capture_lines - capture_lines // 2, log=self._log, log_path=log_path)
+        self.stderr: OutputBuffer = OutputBuffer(head=stderr_capture_lines // 2, tail=stderr_capture_lines - stderr_capture_lines // 2, log=self._log, log_path=log_path)
+        self.max_output_lines: int = max_output_lines
+        self.terminate_event: asyncio.Event = asyncio.Event()
+        self.limit_event: asyncio.Event = asyncio.Event()
+        self.truncated: bool = False
+        self.timed_out: bool = False
+        now = datetime.now().strftime("%Y/%m/%d %H:%M:%S")
+        self.prefix_line: str = f"<{now}> {command}\n"
+        self._stdout: Fanout = Fanout()
+        self._stderr: Fanout = Fanout()
+
+    def check_limit(self) -> None:
+        if self.max_output_lines > 0 and len(self.stderr) + len(self.stdout) > self.max_output_lines:
+            self.limit_event.set()
+
+    def terminate(self) -> None:
+        self.terminate_event.set()
+
+    def close(self) -> None:
+        self._stdout.flush()
+        self._stderr.flush()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    @property
+    def terminated(self) -> bool:
+        return self.terminate_event.is_set()
+
+    def result(self, return_code: Optional[int]) -> Result:
+        return Result(
+            command=self.command,
+            return_code=return_code,
+            stdout_lines=self.stdout.lines,
+            stderr_lines=self.stderr.lines,
+            terminated=self.terminated,
+            truncated=self.truncated,
+            timed_out=self.timed_out,
+            log_path=self.log_path,
+        )
+
+    def register_stdout_terminal(self, terminal: Terminal) -> None:
+        self._stdout.add(terminal, [self.prefix_line] + list(self.stdout))
+
+    def register_stderr_terminal(self, terminal: Terminal) -> None:
+        self._stderr.add(terminal, list(self.stderr))
+
+    def release_stdout_terminal(self, terminal: Terminal) -> None:
+        self._stdout.remove(terminal)
+
+    def release_stderr_terminal(self, terminal: Terminal) -> None:
+        self._stderr.remove(terminal)
+
+
+class Stream:
+    stderr_capture_lines: int = 200
+
+    def __init__(self, cli: "Cli", command: str, create: Callable[[], Awaitable[Any]], max_output_lines: int = 0, timeout: Optional[float] = None) -> None:
+        self._cli: "Cli" = cli
+        self.command: str = command
+        self._create: Callable[[], Awaitable[Any]] = create
+        self._max_output_lines: int = max_output_lines
+        self._timeout: Optional[float] = timeout
+        self._iterator: Optional[AsyncGenerator[str, None]] = None
+        self.result: Optional[Result] = None
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        if self._iterator is None:
+            self._iterator = self._lines()
+        return self._iterator
+
+    async def __aenter__(self) -> "Stream":
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._iterator is not None:
+            await self._iterator.aclose()
+
+    async def _lines(self) -> AsyncGenerator[str, None]:
+        invocation = Invocation(self.command, self._max_output_lines, capture_lines=2, stderr_capture_lines=self.stderr_capture_lines)
+        await self._cli._acquire(invocation)
+        process = None
+        try:
+            process = await self._create()
+            self._cli._stdout.write("\n" + invocation.prefix_line)
+            tasks = [
+                asyncio.ensure_future(self._cli._controller(invocation=invocation, process=process, timeout=self._timeout)),
+                asyncio.ensure_future(self._cli._read_stderr(invocation=invocation, stream=process.stderr)),
+            ]
+            eof = False
+            try:
+                while True:
+                    buf = await self._cli._wait_on_stream(stream=process.stdout)
+                    if not buf:
+                        eof = True
+                        break
+                    if invocation.limit_event.is_set() is False:
+                        self._cli._receive_stdout(invocation, buf)
+                        yield buf
+            finally:
+                if eof is False:
+                    invocation.terminate()
+                    tasks.append(asyncio.ensure_future(self._cli._drain(stream=process.stdout)))
+                await asyncio.shield(asyncio.gather(*tasks, return_exceptions=True))
+            await process.wait()
+        finally:
+            invocation.close()
+            self.result = invocation.result(process.returncode if process is not None else None)
+            await asyncio.shield(self._cli._release(invocation))
+
+
 class Cli:
-    def __init__(self, seperator: Union[bytes, None] = b"\n") -> None:
+    def __init__(self, seperator: Union[bytes, None] = b"\n", max_concurrent: int = 1) -> None:
         self.seperator: Union[bytes, None] = seperator
-        self.stdout: List[str] = []
-        self.stderr: List[str] = []
-        self._terminate: asyncio.Event = asyncio.Event()
-        self._busy: bool = False
-        self._truncated: bool = False
-        self.prefix_line: str = ""
-        self._stdout_terminals: List[Terminal] = []
-        self._stderr_terminals: List[Terminal] = []
+        self.max_concurrent: int = max_concurrent
+        self.kill_timeout: float = 5
+        self.capture_lines: int = 0
+        self.log_dir: str = ""
+        self.log_keep: int = 50
+        self._invocations: List[Invocation] = []
+        self._last: Union[Invocation, None] = None
+        self._slots: asyncio.Condition = asyncio.Condition()
+        self._stdout: Fanout = Fanout()
+        self._stderr: Fanout = Fanout()
 
     async def _wait_on_stream(self, stream: asyncio.streams.StreamReader) -> Union[str, None]:
         if self.seperator is None:
@@ -51,140 +339,168 @@ class Cli:
                 raise e
         return buf.decode("utf-8")
 
-    async def _read_stdout(self, stream: asyncio.streams.StreamReader) -> None:
+    def _receive_stdout(self, invocation: Invocation, buf: str) -> None:
+        invocation.stdout.append(buf)
+        invocation.check_limit()
+        invocation._stdout.write(buf)
+        self._stdout.write(buf)
+
+    async def _read_stdout(self, invocation: Invocation, stream: asyncio.streams.StreamReader) -> None:
         while True:
             buf = await self._wait_on_stream(stream=stream)
-            if buf:
-                self.stdout.append(buf)
-                for terminal in self._stdout_terminals:
-                    terminal.call_terminal_method("write", buf)
-            else:
+            if not buf:
                 break
+            if invocation.limit_event.is_set() is False:
+                self._receive_stdout(invocation, buf)
 
-    async def _read_stderr(self, stream: asyncio.streams.StreamReader) -> None:
+    async def _read_stderr(self, invocation: Invocation, stream: asyncio.streams.StreamReader) -> None:
         while True:
             buf = await self._wait_on_stream(stream=stream)
-            if buf:
-                self.stderr.append(buf)
-                for terminal in self._stderr_terminals:
-                    terminal.call_terminal_method("write", buf)
-            else:
+            if not buf:
                 break
+            if invocation.limit_event.is_set() is False:
+                invocation.stderr.append(buf)
+                invocation.check_limit()
+                invocation._stderr.write(buf)
+                self._stderr.write(buf)
 
-    async def _controller(self, process: Process, max_output_lines) -> None:
-        while process.returncode is None:
-            if max_output_lines > 0 and len(self.stderr) + len(self.stdout) > max_output_lines:
-                self._truncated = True
-                process.terminate()
-            if self._terminate.is_set():
-                process.terminate()
-            try:
-                with contextlib.suppress(asyncio.TimeoutError):
-                    await asyncio.wait_for(process.wait(), 0.1)
-            except Exception as e:
-                logger.exception(e)
+    async def _drain(self, stream: asyncio.streams.StreamReader) -> None:
+        with contextlib.suppress(Exception):
+            while await self._wait_on_stream(stream=stream):
+                pass
 
-    def terminate(self) -> None:
-        self._terminate.set()
+    async def _exited(self, process: Process, done: asyncio.Future, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while not done.done() and process.returncode is None and time.monotonic() < deadline:
+            await asyncio.wait([done], timeout=0.05)
+        return done.done() or process.returncode is not None
 
-    async def execute(self, command: str, max_output_lines: int = 0) -> Result:
-        self._busy = True
-        c = shlex.split(command, posix=False)
+    async def _stop(self, process: Process, done: asyncio.Future) -> None:
+        with contextlib.suppress(ProcessLookupError):
+            process.terminate()
+        if not await self._exited(process, done, self.kill_timeout):
+            logger.warning(f"Process did not exit {self.kill_timeout}s after terminate, killing.")
+            with contextlib.suppress(ProcessLookupError):
+                process.kill()
+            await self._exited(process, done, self.kill_timeout)
+        await asyncio.wait([done], timeout=0.1)
+        transport = getattr(process, "_transport", None)
+        if not done.done() and transport is not None:
+            logger.info("Process output is still held open after exit, closing pipes.")
+            transport.close()
+
+    async def _controller(self, invocation: Invocation, process: Process, timeout: Optional[float] = None) -> None:
+        done = asyncio.ensure_future(process.wait())
+        limit = asyncio.ensure_future(invocation.limit_event.wait())
+        terminate = asyncio.ensure_future(invocation.terminate_event.wait())
         try:
-            process = await asyncio.create_subprocess_exec(*c, stdout=PIPE, stderr=PIPE)
-            if process is not None and process.stdout is not None and process.stderr is not None:
-                self.stdout.clear()
-                self.stderr.clear()
-                self._terminate.clear()
-                self._truncated = False
-                terminated = False
-                now = datetime.now().strftime("%Y/%m/%d %H:%M:%S")
-                self.prefix_line = f"<{now}> {command}\n"
-                for terminal in self._stdout_terminals:
-                    terminal.call_terminal_method("write", "\n" + self.prefix_line)
-                await asyncio.gather(
-                    self._controller(process=process, max_output_lines=max_output_lines),
-                    self._read_stdout(stream=process.stdout),
-                    self._read_stderr(stream=process.stderr),
-                )
-                if self._terminate.is_set():
-                    terminated = True
-                await process.wait()
+            finished, _ = await asyncio.wait([done, limit, terminate], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if done not in finished:
+                if limit in finished:
+                    invocation.truncated = True
+                elif terminate not in finished:
+                    invocation.timed_out = True
+                await self._stop(process, done)
+            await done
         except Exception as e:
-            raise e
+            logger.exception(e)
         finally:
-            self._terminate.clear()
-            self._busy = False
-        return Result(
-            command=command,
-            return_code=process.returncode,
-            stdout_lines=self.stdout.copy(),
-            stderr_lines=self.stderr.copy(),
-            terminated=terminated,
-            truncated=self._truncated,
-        )
+            limit.cancel()
+            terminate.cancel()
+
+    def terminate(self) -> None:
+        for invocation in self._invocations:
+            invocation.terminate()
+
+    async def _acquire(self, invocation: Invocation) -> None:
+        async with self._slots:
+            await self._slots.wait_for(lambda: len(self._invocations) < self.max_concurrent)
+            self._invocations.append(invocation)
+            self._last = invocation
+
+    async def _release(self, invocation: Invocation) -> None:
+        async with self._slots:
+            self._invocations.remove(invocation)
+            self._slots.notify_all()
+
+    def _log_path(self) -> str:
+        if self.log_dir == "":
+            return ""
+        path = Path(self.log_dir).resolve()
+        os.makedirs(path, exist_ok=True)
+        logs = sorted(path.glob("*.log.gz"), key=lambda log: log.stat().st_mtime)
+        for log in logs[: max(0, len(logs) - self.log_keep + 1)]:
+            with contextlib.suppress(OSError):
+                log.unlink()
+        return f"{path}/{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.log.gz"
 
-    async def shell(self, command: str, max_output_lines: int = 0) -> Result:
-        self._busy = True
+    async def _run(self, command: str, create: Callable[[], Awaitable[Any]], max_output_lines: int = 0, timeout: Optional[float] = None) -> Result:
+        invocation = Invocation(command, max_output_lines, self.capture_lines, await asyncio.to_thread(self._log_path))
         try:
-            process = await asyncio.create_subprocess_shell(command, stdout=PIPE, stderr=PIPE)
+            await self._acquire(invocation)
+        except asyncio.CancelledError:
+            invocation.close()
+            raise
+        try:
+            process = await create()
             if process is not None and process.stdout is not None and process.stderr is not None:
-                self.stdout.clear()
-                self.stderr.clear()
-                self._terminate.clear()
-                self._truncated = False
-                terminated = False
-                now = datetime.now().strftime("%Y/%m/%d %H:%M:%S")
-                self.prefix_line = f"<{now}> {command}\n"
-                for terminal in self._stdout_terminals:
-                    terminal.call_terminal_method("write", "\n" + self.prefix_line)
+                self._stdout.write("\n" + invocation.prefix_line)
                 await asyncio.gather(
-                    self._controller(process=process, max_output_lines=max_output_lines),
-                    self._read_stdout(stream=process.stdout),
-                    self._read_stderr(stream=process.stderr),
+                    self._controller(invocation=invocation, process=process, timeout=timeout),
+                    self._read_stdout(invocation=invocation, stream=process.stdout),
+                    self._read_stderr(invocation=invocation, stream=process.stderr),
                 )
-                if self._terminate.is_set():
-                    terminated = True
                 await process.wait()
         except Exception as e:
             raise e
         finally:
-            self._terminate.clear()
-            self._busy = False
-        return Result(
-            command=command,
-            return_code=process.returncode,
-            stdout_lines=self.stdout.copy(),
-            stderr_lines=self.stderr.copy(),
-            terminated=terminated,
-            truncated=self._truncated,
-        )
+            invocation.close()
+            self._stdout.flush()
+            self._stderr.flush()
+            await self._release(invocation)
+        return invocation.result(process.returncode)
+
+    async def execute(self, command: str, max_output_lines: int = 0, timeout: Optional[float] = None) -> Result:
+        c = shlex.split(command, posix=False)
+        return await self._run(command, lambda: asyncio.create_subprocess_exec(*c, stdout=PIPE, stderr=PIPE), max_output_lines, timeout)
+
+    async def shell(self, command: str, max_output_lines: int = 0, timeout: Optional[float] = None) -> Result:
+        return await self._run(command, lambda: asyncio.create_subprocess_shell(command, stdout=PIPE, stderr=PIPE), max_output_lines, timeout)
+
+    def stream(self, command: str, max_output_lines: int = 0, timeout: Optional[float] = None) -> Stream:
+        c = shlex.split(command, posix=False)
+        return Stream(self, command, lambda: asyncio.create_subprocess_exec(*c, stdout=PIPE, stderr=PIPE), max_output_lines, timeout)
 
     def clear_buffers(self):
-        self.prefix_line = ""
-        self.stdout.clear()
-        self.stderr.clear()
+        self._last = None
+
+    @property
+    def invocations(self) -> List[Invocation]:
+        return self._invocations.copy()
+
+    @property
+    def stdout(self) -> List[str]:
+        return self._last.stdout.lines if self._last is not None else []
+
+    @property
+    def stderr(self) -> List[str]:
+        return self._last.stderr.lines if self._last is not None else []
+
+    @property
+    def prefix_line(self) -> str:
+        return self._last.prefix_line if self._last is not None else ""
 
     def register_stdout_terminal(self, terminal: Terminal) -> None:
-        if terminal not in self._stdout_terminals:
-            terminal.call_terminal_method("write", self.prefix_line)
-            for line in self.stdout:
-                terminal.call_terminal_method("write", line)
-            self._stdout_terminals.append(terminal)
+        self._stdout.add(terminal, [self.prefix_line] + list(self.stdout))
 
     def register_stderr_terminal(self, terminal: Terminal) -> None:
-        if terminal not in self._stderr_terminals:
-            for line in self.stderr:
-                terminal.call_terminal_method("write", line)
-            self._stderr_terminals.append(terminal)
+        self._stderr.add(terminal, list(self.stderr))
 
     def release_stdout_terminal(self, terminal: Terminal) -> None:
-        if terminal in self._stdout_terminals:
-            self._stdout_terminals.remove(terminal)
+        self._stdout.remove(terminal)
 
     def release_stderr_terminal(self, terminal: Terminal) -> None:
-        if terminal in self._stderr_terminals:
-            self._stderr_terminals.remove(terminal)
+        self._stderr.remove(terminal)
 
     def register_terminal(self, terminal: Terminal) -> None:
         self.register_stdout_terminal(terminal=terminal)
@@ -196,4 +512,8 @@ class Cli:
 
     @property
     def is_busy(self):
-        return self._busy
+        return len(self._invocations) > 0
+
+    @property
+    def at_capacity(self) -> bool:
+        return len(self._invocations) >= self.max_concurrent
@@ -1,7 +1,18 @@
-from typing import Dict, Optional, Union
+from typing import AsyncContextManager, Dict, Optional, Union
 import os
+import asyncio
+from asyncio.subprocess import Process, PIPE
+import shlex
 from pathlib import Path
 from bale.interfaces import cli
+from bale.interfaces import sshpool
+import asyncssh
+import logging
+
+logger = logging.getLogger(__name__)
+
+control_persist: int = 300
+connection_stats: Dict[str, Dict[str, int]] = {}
 
 
 def get_hosts(path: str = "data"):
@@ -36,8 +47,10 @@ class Ssh(cli.Cli):
         options: Optional[Dict[str, str]] = None,
         path: str = "data",
         seperator: bytes = b"\n",
+        backend: str = "cli",
+        max_concurrent: int = 1,
     ) -> None:
-        super().__init__(seperator=seperator)
+        super().__init__(seperator=seperator, max_concurrent=max_concurrent)
         self._raw_path: str = path
         self._path: Path = Path(path).resolve()
         self.host: str = host.replace(" ", "")
@@ -46,10 +59,12 @@ class Ssh(cli.Cli):
         if password is None:
             self.use_key = True
         self.options: Optional[Dict[str, str]] = options
+        self.backend: str = backend
         self.key_path: str = f"{self._path}/id_rsa"
         self._base_command: str = ""
         self._full_command: str = ""
         self._config_path: str = f"{self._path}/config"
+        self._sockets_path: str = f"{self._path}/sockets"
         self._config: Dict[str, Dict[str, str]] = {}
         self.read_config()
         self.hostname: str = hostname or self._config.get(host.replace(" ", ""), {}).get("HostName", "")
@@ -86,6 +101,9 @@ class Ssh(cli.Cli):
             "IdentityFile": self.key_path,
             "StrictHostKeychecking": "no",
             "IdentitiesOnly": "yes",
+            "ControlMaster": "auto",
+            "ControlPath": f"{self._sockets_path}/%C",
+            "ControlPersist": str(control_persist),
         }
         self._config[self.host]["PasswordAuthentication"] = "no" if self.password is None else "yes"
         if self.hostname != "":
@@ -94,19 +112,87 @@ class Ssh(cli.Cli):
             self._config[self.host]["User"] = self.username
         if self.options is not None:
             self._config[self.host].update(self.options)
+        os.makedirs(self._sockets_path, exist_ok=True)
         self.write_config()
 
     def remove(self) -> None:
         del self._config[self.host]
         self.write_config()
 
-    async def execute(self, command: str, max_output_lines: int = 0) -> cli.Result:
+    async def _master_alive(self) -> bool:
+        result = await cli.Cli().execute(f"ssh -F {self._config_path} -O check {self.host}")
+        return result.return_code == 0
+
+    async def _count_connection(self) -> None:
+        stats = self.connection_stats
+        if await self._master_alive():
+            stats["reused"] += 1
+        else:
+            stats["handshakes"] += 1
+
+    async def check_connection(self) -> bool:
+        stats = self.connection_stats
+        stats["checks"] += 1
+        if await self._master_alive():
+            return True
+        stats["failed_checks"] += 1
+        return False
+
+    async def close_connection(self) -> cli.Result:
+        return await cli.Cli().execute(f"ssh -F {self._config_path} -O exit {self.host}")
+
+    async def create_remote_process(self, command: str) -> Union[sshpool.Process, sshpool.FailedProcess]:
+        return await sshpool.create_process(
+            self.host,
+            self.hostname,
+            self.username,
+            self.key_path,
+            command,
+            password=self.password,
+            port=int(self._config.get(self.host, {}).get("Port", 22)),
+            config_path=self._config_path,
+        )
+
+    def sftp(self, browse: bool = False) -> AsyncContextManager[asyncssh.SFTPClient]:
+        return sshpool.sftp(
+            self.host,
+            self.hostname,
+            self.username,
+            self.key_path,
+            password=self.password,
+            port=int(self._config.get(self.host, {}).get("Port", 22)),
+            config_path=self._config_path,
+            browse=browse,
+        )
+
+    async def execute(self, command: str, max_output_lines: int = 0, timeout: Optional[float] = None) -> cli.Result:
+        if self.backend == "asyncssh":
+            self._full_command = command
+            return await self._run(command, lambda: self.create_remote_process(command), max_output_lines, timeout)
+        self._full_command = f"{self.base_command} {command}"
+        await self._count_connection()
+        return await super().execute(self._full_command, max_output_lines, timeout)
+
+    async def shell(self, command: str, max_output_lines: int = 0, timeout: Optional[float] = None) -> cli.Result:
+        if self.backend == "asyncssh":
+            self._full_command = command
+            return await self._run(command, lambda: self.create_remote_process(command), max_output_lines, timeout)
         self._full_command = f"{self.base_command} {command}"
-        return await super().execute(self._full_command, max_output_lines)
+        await self._count_connection()
+        return await super().shell(self._full_command, max_output_lines, timeout)
 
-    async def shell(self, command: str, max_output_lines: int = 0) -> cli.Result:
+    def stream(self, command: str, max_output_lines: int = 0, timeout: Optional[float] = None) -> cli.Stream:
+        if self.backend == "asyncssh":
+            self._full_command = command
+            return cli.Stream(self, command, lambda: self.create_remote_process(command), max_output_lines, timeout)
         self._full_command = f"{self.base_command} {command}"
-        return await super().shell(self._full_command, max_output_lines)
+        arguments = shlex.split(self._full_command, posix=False)
+
+        async def create() -> Process:
+            await self._count_connection()
+            return await asyncio.create_subprocess_exec(*arguments, stdout=PIPE, stderr=PIPE)
+
+        return cli.Stream(self, self._full_command, create, max_output_lines, timeout)
 
     async def send_key(self) -> cli.Result:
         await get_public_key(self._raw_path)
@@ -117,6 +203,12 @@ class Ssh(cli.Cli):
     def config_path(self):
         return self._config_path
 
+    @property
+    def connection_stats(self) -> Dict[str, int]:
+        if self.host not in connection_stats:
+            connection_stats[self.host] = {"reused": 0, "handshakes": 0, "checks": 0, "failed_checks": 0}
+        return connection_stats[self.host]
+
     @property
     def base_command(self):
         self._base_command = f'{"" if self.use_key else f"sshpass -p {self.password} "} ssh -F {self._config_path} {self.host}'
@@ -1,13 +1,30 @@
-from typing import Any, AsyncIterable, Coroutine, Dict, List, Optional, Union, Tuple
+from typing import Any, AsyncIterable, AsyncIterator, Coroutine, Dict, List, Optional, Union, Tuple
+import asyncio
+from collections import deque
+import contextlib
+from dataclasses import dataclass, field
+import os
 from pathlib import Path
+import shlex
 import stat
+import tarfile
+import time
 from datetime import datetime
+from email.utils import formatdate
+import hashlib
+from urllib.parse import quote
 import uuid
 from nicegui import app, background_tasks, events, ui  # type: ignore
-from fastapi.responses import StreamingResponse
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
 import asyncssh
 from bale import elements as el
+from bale import grid
 from bale.interfaces.zfs import Ssh
+from bale.interfaces.catalog import Catalog, search_all
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 def format_bytes(size: Union[int, float]) -> str:
@@ -21,15 +38,316 @@ def format_bytes(size: Union[int, float]) -> str:
     return f"{s}{suffixs[n]}B"
 
 
+class Reader:
+    min_block_size: int = 16384
+    max_block_size: int = 1048576
+    max_requests: int = 16
+
+    def __init__(self, sftp: asyncssh.SFTPClient, path: str, offset: int = 0, length: Optional[int] = None, block_size: int = 65536) -> None:
+        self._sftp: asyncssh.SFTPClient = sftp
+        self.path: str = path
+        self.offset: int = offset
+        self.length: Optional[int] = length
+        self.block_size: int = block_size
+        self.bytes: int = 0
+        self.requests: int = 0
+        self.short_reads: int = 0
+        self.started: float = 0
+        self.finished: float = 0
+
+    def _grow(self, requested: int, received: int) -> None:
+        if received < requested:
+            self.short_reads += 1
+            self.block_size = max(self.min_block_size, received)
+            self.max_block_size = self.block_size
+        elif requested >= self.block_size:
+            self.block_size = min(self.max_block_size, self.block_size * 2)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        if self.length is None:
+            attributes = await self._sftp.stat(self.path)
+            self.length = max(0, (attributes.size or 0) - self.offset)
+        end = self.offset + self.length
+        position = self.offset
+        scheduled = self.offset
+        pending: Dict[int, Tuple[asyncio.Task, int]] = {}
+        self.started = time.monotonic()
+        async with self._sftp.open(self.path, "rb", encoding=None, block_size=0) as remote_file:
+
+            def schedule(offset: int, size: int) -> None:
+                pending[offset] = (asyncio.create_task(remote_file.read(size, offset)), size)
+                self.requests += 1
+
+            try:
+                while position < end:
+                    while len(pending) < self.max_requests and scheduled < end:
+                        size = min(self.block_size, end - scheduled)
+                        schedule(scheduled, size)
+                        scheduled += size
+                    task, requested = pending.pop(position)
+                    data = await task
+                    if len(data) == 0:
+                        break
+                    self._grow(requested, len(data))
+                    if len(data) < requested:
+                        schedule(position + len(data), requested - len(data))
+                    position += len(data)
+                    self.bytes += len(data)
+                    yield data
+            finally:
+                for task, _ in pending.values():
+                    task.cancel()
+                self.finished = time.monotonic()
+                logger.info(f"Read {format_bytes(self.bytes)} of {self.path} in {self.elapsed:.1f}s at {self.rate:.1f} MB/s with {self.requests} requests.")
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started if self.started > 0 else 0
+
+    @property
+    def rate(self) -> float:
+        return self.bytes / self.elapsed / 1000000 if self.elapsed > 0 else 0
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    unit, _, ranges = header.partition("=")
+    if unit.strip() != "bytes" or "," in ranges:
+        return None
+    first, _, last = ranges.strip().partition("-")
+    if not (first.isdigit() or first == "") or not (last.isdigit() or last == "") or first == last == "":
+        return None
+    if first == "":
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(f"Unsatisfiable range {header}")
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last != "" and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(f"Unsatisfiable range {header}")
+    return start, min(int(last), size - 1) if last != "" else size - 1
+
+
+async def serve_file(zfs: Ssh, path: str, name: str, request: Request) -> Response:
+    try:
+        async with zfs.sftp(browse=True) as sftp:
+            attributes = await sftp.stat(path)
+    except asyncssh.SFTPNoSuchFile:
+        return Response(status_code=404)
+    size = attributes.size or 0
+    mtime = attributes.mtime or 0
+    etag = f'"{hashlib.sha1(f"{zfs.host}:{path}:{size}:{mtime}".encode()).hexdigest()}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(name)}",
+    }
+    status = 200
+    start, end = 0, size - 1
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    if "range" in request.headers and request.headers.get("if-range", etag) == etag:
+        try:
+            span = parse_range(request.headers["range"], size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if span is not None:
+            status = 206
+            start, end = span
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(0, end - start + 1))
+    if request.method == "HEAD":
+        return Response(status_code=status, headers=headers, media_type="application/octet-stream")
+
+    async def read_blocks() -> AsyncIterable[bytes]:
+        async with zfs.sftp() as sftp:
+            async for chunk in Reader(sftp, path, offset=start, length=end - start + 1):
+                yield chunk
+
+    return StreamingResponse(read_blocks(), status_code=status, headers=headers, media_type="application/octet-stream")
+
+
+small_file_size: int = 1048576
+archive_prefetch: int = 8
+
+
+def archive_names(paths: List[str]) -> Tuple[str, List[str]]:
+    root = os.path.commonpath([os.path.dirname(path.rstrip("/")) or "/" for path in paths])
+    return root, [os.path.relpath(path, root) for path in paths]
+
+
+async def _walk(sftp: asyncssh.SFTPClient, path: str, arcname: str, attributes: asyncssh.SFTPAttrs) -> AsyncIterator[Tuple[str, tarfile.TarInfo]]:
+    info = tarfile.TarInfo(arcname)
+    permissions = attributes.permissions or 0
+    info.mode = stat.S_IMODE(permissions)
+    info.mtime = attributes.mtime or 0
+    info.uid = attributes.uid or 0
+    info.gid = attributes.gid or 0
+    if stat.S_ISDIR(permissions):
+        info.type = tarfile.DIRTYPE
+        yield path, info
+        entries = sorted(await sftp.readdir(path), key=lambda entry: str(entry.filename))
+        for entry in entries:
+            if entry.filename in ["", ".", ".."]:
+                continue
+            async for item in _walk(sftp, f"{path}/{entry.filename}", f"{arcname}/{entry.filename}", entry.attrs):
+                yield item
+    elif stat.S_ISLNK(permissions):
+        info.type = tarfile.SYMTYPE
+        info.linkname = await sftp.readlink(path)
+        yield path, info
+    elif stat.S_ISREG(permissions):
+        info.size = attributes.size or 0
+        yield path, info
+
+
+async def tar_blocks(zfs: Ssh, paths: List[str]) -> AsyncIterator[bytes]:
+    root, names = archive_names(paths)
+    window: deque = deque()
+
+    async def read(sftp: asyncssh.SFTPClient, path: str, size: int) -> bytes:
+        return b"".join([chunk async for chunk in Reader(sftp, path, length=size)])
+
+    async def emit(sftp: asyncssh.SFTPClient, path: str, info: tarfile.TarInfo, task: Optional[asyncio.Task]) -> AsyncIterator[bytes]:
+        yield info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+        if info.isreg():
+            written = 0
+            if task is not None:
+                data = await task
+                written = len(data)
+                yield data
+            else:
+                async for chunk in Reader(sftp, path, length=info.size):
+                    written += len(chunk)
+                    yield chunk
+            if written < info.size:
+                logger.warning(f"{path} shrank while archiving, padding {info.size - written} bytes.")
+                yield b"\0" * (info.size - written)
+            yield b"\0" * (-info.size % tarfile.BLOCKSIZE)
+
+    async with zfs.sftp() as sftp:
+        try:
+            for top, name in zip(paths, names):
+                async for path, info in _walk(sftp, top, name, await sftp.lstat(top)):
+                    large = info.isreg() and info.size > small_file_size
+                    task = asyncio.create_task(read(sftp, path, info.size)) if info.isreg() and not large else None
+                    window.append((path, info, task))
+                    while len(window) > (0 if large else archive_prefetch):
+                        async for block in emit(sftp, *window.popleft()):
+                            yield block
+            while len(window) > 0:
+                async for block in emit(sftp, *window.popleft()):
+                    yield block
+            yield b"\0" * (tarfile.BLOCKSIZE * 2)
+        finally:
+            for _, _, task in window:
+                if task is not None:
+                    task.cancel()
+
+
+async def remote_archive_blocks(zfs: Ssh, paths: List[str], compression: str = "zstd", block_size: int = 65536) -> AsyncIterator[bytes]:
+    root, names = archive_names(paths)
+    archive = f"tar -C {shlex.quote(root)} -cf - -- {' '.join(shlex.quote(name) for name in names)}"
+    command = f'{{ {archive}; echo "bale:tar:$?" >&2; }} | {compression} -c'
+    process = await zfs.create_remote_process(command)
+    errors: deque = deque(maxlen=20)
+    status = {"tar": None}
+
+    async def drain() -> None:
+        while True:
+            line = await process.stderr.readline()
+            if not line:
+                break
+            line = line.decode(errors="replace").rstrip()
+            if line.startswith("bale:tar:"):
+                status["tar"] = int(line[9:])
+            else:
+                errors.append(line)
+
+    stderr = asyncio.create_task(drain())
+    try:
+        while True:
+            chunk = await process.stdout.read(block_size)
+            if not chunk:
+                break
+            yield chunk
+        returncode = await process.wait()
+        await stderr
+        if status["tar"] != 0 or returncode != 0:
+            message = f"<{zfs.host}> Remote archive failed (tar {status['tar']}, {compression} {returncode}): {archive}"
+            logger.warning(f"{message}\n" + "\n".join(errors))
+            raise OSError(message)
+    finally:
+        if process.returncode is None:
+            process.kill()
+        stderr.cancel()
+
+
+@dataclass(kw_only=True)
+class Download:
+    zfs: Ssh
+    path: str
+    name: str
+    expires: float
+    paths: List[str] = field(default_factory=list)
+    compression: str = ""
+
+
+download_lifetime: float = 3600
+max_downloads: int = 1000
+_downloads: Dict[str, Download] = {}
+
+
+def _expire_downloads() -> None:
+    now = time.monotonic()
+    for token in [token for token, download in _downloads.items() if download.expires <= now]:
+        del _downloads[token]
+    while len(_downloads) >= max_downloads:
+        del _downloads[next(iter(_downloads))]
+
+
+def register_download(zfs: Ssh, path: str, name: str, paths: Optional[List[str]] = None, compression: str = "") -> str:
+    _expire_downloads()
+    token = uuid.uuid4().hex
+    _downloads[token] = Download(zfs=zfs, path=path, name=name, expires=time.monotonic() + download_lifetime, paths=paths or [], compression=compression)
+    return f"/download/{token}"
+
+
+def revoke_download(token: str) -> None:
+    _downloads.pop(token, None)
+
+
+def serve_archive(download: Download, request: Request) -> Response:
+    headers = {"Content-Disposition": f"attachment; filename*=UTF-8''{quote(download.name)}"}
+    if request.method == "HEAD":
+        return Response(headers=headers, media_type="application/x-tar")
+    if download.compression != "":
+        return StreamingResponse(remote_archive_blocks(download.zfs, download.paths, download.compression), headers=headers, media_type="application/zstd")
+    return StreamingResponse(tar_blocks(download.zfs, download.paths), headers=headers, media_type="application/x-tar")
+
+
+@app.api_route("/download/{token}", methods=["GET", "HEAD"])
+async def download_file(token: str, request: Request) -> Response:
+    download = _downloads.get(token)
+    if download is None or download.expires <= time.monotonic():
+        revoke_download(token)
+        return Response(status_code=404)
+    download.expires = time.monotonic() + download_lifetime
+    if len(download.paths) > 0:
+        return serve_archive(download, request)
+    return await serve_file(download.zfs, download.path, download.name, request)
+
+
 class SshFileBrowse(ui.dialog):
     def __init__(self, zfs: Ssh, path: str = "/") -> None:
         super().__init__()
         self._zfs: Ssh = zfs
+        self._connections: Dict[str, Ssh] = {zfs.host: zfs}
         self._starting_path: str = path
         self._path: Path
         self.path = path
-        self._ssh: Optional[asyncssh.SSHClientConnection] = None
-        self._sftp: Optional[asyncssh.SFTPClient] = None
         ui.timer(0, self._display, once=True)
         self._card: el.Card
         self._grid: ui.aggrid
@@ -76,7 +394,7 @@ class SshFileBrowse(ui.dialog):
                                         }""",
                                 },
                             ],
-                            "rowSelection": "single",
+                            "rowSelection": "multiple",
                         },
                         html_columns=[0],
                         theme="balham-dark",
@@ -86,26 +404,14 @@ class SshFileBrowse(ui.dialog):
                 with el.WRow() as row:
                     row.tailwind.height("[40px]")
                     el.DButton("Download", on_click=self._start_download)
+                    self._compress = el.DCheckbox("zstd")
                     ui.button("Exit", on_click=lambda: self.submit("exit"))
         await self._update_handler()
 
-    async def _connect(self) -> Tuple[asyncssh.SSHClientConnection, asyncssh.SFTPClient]:
-        ssh = await asyncssh.connect(self._zfs.hostname, username=self._zfs.username, client_keys=[self._zfs.key_path])
-        sftp = await ssh.start_sftp_client()
-        return ssh, sftp
-
-    async def _close_handlers(self) -> None:
-        if self._sftp is not None:
-            self._sftp.exit()
-            await self._sftp.wait_closed()
-        if self._ssh is not None:
-            self._ssh.close()
-            await self._ssh.wait_closed()
-
     async def _ls(self, path) -> List[Dict[str, Union[str, datetime]]]:
         infos = []
-        if self._sftp is not None:
-            file_attrs = await self._sftp.readdir(path)
+        async with self._zfs.sftp(browse=True) as sftp:
+            file_attrs = await sftp.readdir(path)
             for file_attr in file_attrs:
                 if file_attr.filename in ["", ".", ".."]:
                     continue
@@ -139,8 +445,6 @@ class SshFileBrowse(ui.dialog):
 
     async def _update_handler(self) -> None:
         self._grid.call_api_method("showLoadingOverlay")
-        if self._ssh is None or self._sftp is None:
-            self._ssh, self._sftp = await self._connect()
         paths = await self._ls(self.path)
         priorities = {"directory": "b", "file": "c", "link": "d", "unknown": "e"}
         self._grid.options["rowData"] = [
@@ -172,40 +476,24 @@ class SshFileBrowse(ui.dialog):
     async def _start_download(self, e: events.GenericEventArguments = None) -> None:
         if e is None:
             rows = await ui.run_javascript(f"getElement({self._grid.id}).gridOptions.api.getSelectedRows()")
-            row = rows[0]
         else:
-            row = e.args["data"]
-        download_url: str = f"/download/{uuid.uuid4()}.txt"
-
-        async def read_blocks() -> AsyncIterable[str]:
-            offset = 0
-            blocksize = 65536
-            ssh, sftp = await self._connect()
-            async with sftp.open(row["path"], "rb") as remote_file:
-                while True:
-                    chunk = await remote_file.read(size=blocksize, offset=offset)
-                    if not chunk:
-                        app.routes[:] = [route for route in app.routes if route.path != download_url]
-                        break
-                    yield chunk
-                    offset = offset + blocksize
-            sftp.exit()
-            await sftp.wait_closed()
-            ssh.close()
-            await ssh.wait_closed()
-
-        with self._card:
-
-            @app.get(download_url)
-            def download() -> StreamingResponse:
-                headers = {"Content-Disposition": f"attachment; filename={row['name']}"}
-                return StreamingResponse(read_blocks(), media_type="text/plain", headers=headers)
-
-        ui.download(download_url)
-
-    def __await__(self) -> None:
-        ui.timer(0.0001, self._close_handlers, once=True)
-        return super().__await__()
+            rows = [e.args["data"]]
+        rows = [row for row in rows if "bytes" in row]
+        if len(rows) == 0:
+            return
+        zfs = self._connections.get(rows[0].get("host", ""), self._zfs)
+        if len(rows) == 1 and rows[0].get("type", "file") == "file":
+            ui.download(register_download(zfs, rows[0]["path"], rows[0]["name"]))
+            return
+        if any(row.get("host", "") != rows[0].get("host", "") for row in rows):
+            el.notify("Archives can only include files from one host.", type="warning")
+            return
+        paths = [row["path"] for row in rows]
+        root, _ = archive_names(paths)
+        name = Path(paths[0]).name if len(paths) == 1 else Path(root).name or "archive"
+        compression = "zstd" if self._compress.value is True else ""
+        name = f"{name}.tar.zst" if compression != "" else f"{name}.tar"
+        ui.download(register_download(zfs, root, name, paths=paths, compression=compression))
 
     @property
     def path(self) -> str:
@@ -221,20 +509,37 @@ class SshFileBrowse(ui.dialog):
 
 
 class SshFileFind(SshFileBrowse):
+    def __init__(self, zfs: Ssh, path: str = "/", hosts: Optional[Dict[str, Ssh]] = None) -> None:
+        super().__init__(zfs, path)
+        if hosts is not None:
+            self._connections.update(hosts)
+        self.per_host: int = 2
+
     async def _display(self):
         with self, el.Card() as self._card:
             with el.DBody(height="fit", width="[90vw]"):
                 with el.WColumn().classes("col"):
+                    self._catalogs: Dict[str, Catalog] = {}
+                    self._rows: List[Dict[str, Any]] = []
+                    self._search: Optional[asyncio.Task] = None
+                    self._source = grid.register_source(f"find-{id(self)}", lambda: self._rows)
+                    self.on("hide", self._close)
                     filesystems = await self._zfs.filesystems
-                    self._filesystem = el.DSelect(list(filesystems.data.keys()), label="filesystem", with_input=True, on_change=self._update_handler)
+                    with el.WRow():
+                        self._hosts = el.DSelect(list(self._connections.keys()), value=[self._zfs.host], label="Hosts", with_input=True, multiple=True).classes("col")
+                        self._filesystem = el.DSelect(list(filesystems.data.keys()), label="filesystem", with_input=True, clearable=True).classes("col")
+                        self._recursive = el.DCheckbox("Recursive")
                     with el.WRow():
                         self._pattern = ui.input("Pattern").classes("col").on("keydown.enter", handler=self._update_handler)
                         el.LgButton(icon="search", on_click=self._update_handler)
+                        el.LgButton(icon="cancel", on_click=self._cancel)
+                    self._status = ui.label("").classes("text-secondary")
                     self._grid = ui.aggrid(
                         {
                             "defaultColDef": {"flex": 1, "sortable": True, "suppressMovable": True, "sortingOrder": ["asc", "desc"]},
                             "columnDefs": [
                                 {"field": "name", "headerName": "Name", "flex": 1, "sort": "desc", "resizable": True},
+                                {"field": "host", "headerName": "Host", "maxWidth": 120},
                                 {"field": "location", "headerName": "Location", "flex": 1, "resizable": True},
                                 {
                                     "headerName": "Modified",
@@ -254,33 +559,104 @@ class SshFileFind(SshFileBrowse):
                                             return (nodeA.data.bytes > nodeB.data.bytes) ? -1 : 1;
                                         }""",
                                 },
+                                {"field": "snapshots", "headerName": "Snapshots", "maxWidth": 100, "filter": "agNumberColumnFilter"},
+                                {"field": "copies", "headerName": "Copies", "maxWidth": 100, "filter": "agNumberColumnFilter"},
                             ],
-                            "rowSelection": "single",
+                            "rowSelection": "multiple",
                         },
                         html_columns=[0],
                         theme="balham-dark",
                     )
+                    grid.server_side(self._grid, self._source)
                     self._grid.on("cellDoubleClicked", self._handle_double_click)
                     self._grid.tailwind().height("[320px]").width("full")
                 with el.WRow() as row:
                     row.tailwind.height("[40px]")
                     el.DButton("Download", on_click=self._start_download)
+                    self._compress = el.DCheckbox("zstd")
                     ui.button("Exit", on_click=lambda: self.submit("exit"))
                 self._grid.call_api_method("hideOverlay")
 
     async def _update_handler(self) -> None:
-        if len(self._pattern.value) > 0 and self._filesystem is not None:
-            self._grid.call_api_method("showLoadingOverlay")
-            self._filesystem.props("readonly")
-            self._pattern.props("readonly")
-            files = await self._zfs.find_files_in_snapshots(filesystem=self._filesystem.value, pattern=self._pattern.value)
-            self._grid.options["rowData"] = files.data
-            if files.truncated is True:
-                el.notify("Too many files found, truncating list.", type="warning")
-            self._grid.update()
-            self._filesystem.props(remove="readonly")
+        if len(self._pattern.value) > 0:
+            self._cancel()
+            self._search = asyncio.create_task(self._run_search(self._pattern.value))
+
+    def _cancel(self) -> None:
+        if self._search is not None and not self._search.done():
+            self._search.cancel()
+
+    def _close(self) -> None:
+        self._cancel()
+        grid.unregister_source(self._source)
+
+    def _refresh(self, status: str = "") -> None:
+        self._status.text = f"{len(self._rows)} versions found{status}"
+        grid.server_side(self._grid, self._source)
+
+    async def _targets(self) -> List[Tuple[Catalog, str]]:
+        targets = []
+        root = self._filesystem.value or ""
+        for host in self._hosts.value:
+            if host not in self._connections:
+                continue
+            if host not in self._catalogs:
+                self._catalogs[host] = Catalog(self._connections[host])
+            filesystems = await self._connections[host].filesystems
+            for filesystem in filesystems.data.keys():
+                if root == "" or filesystem == root or (self._recursive.value is True and filesystem.startswith(f"{root}/")):
+                    targets.append((self._catalogs[host], filesystem))
+        return targets
+
+    async def _collect(self, catalog: Catalog, filesystem: str, pattern: str) -> None:
+        rows: List[Dict[str, Any]] = []
+        async for batch in catalog.iter_search(filesystem, pattern):
+            rows.extend(batch)
+            if self._rows is rows or len(self._rows) <= len(rows):
+                self._rows = rows
+                self._refresh()
+        self._rows = rows
+        self._refresh()
+
+    async def _search_one(self, catalog: Catalog, filesystem: str, pattern: str) -> None:
+        await self._collect(catalog, filesystem, pattern)
+
+        def progress(done: int, total: int) -> None:
+            self._refresh(f", cataloging snapshot {done + 1}/{total}")
+
+        updated = await catalog.update(filesystem, progress=progress)
+        if updated.return_code != 0:
+            el.notify(f"Unable to search {filesystem}.", type="warning")
+        elif updated.data > 0:
+            await self._collect(catalog, filesystem, pattern)
+
+    async def _search_all(self, targets: List[Tuple[Catalog, str]], pattern: str) -> None:
+        status = f", searched 0/{len(targets)} filesystems"
+
+        def progress(done: int, total: int) -> None:
+            nonlocal status
+            status = f", searched {done}/{total} filesystems"
+            self._refresh(status)
+
+        async with contextlib.aclosing(search_all(targets, pattern, per_host=self.per_host, progress=progress)) as batches:
+            async for batch in batches:
+                self._rows.extend(batch)
+                self._refresh(status)
+
+    async def _run_search(self, pattern: str) -> None:
+        self._pattern.props("readonly")
+        self._rows = []
+        self._refresh()
+        try:
+            targets = await self._targets()
+            if len(targets) == 1:
+                await self._search_one(targets[0][0], targets[0][1], pattern)
+            else:
+                await self._search_all(targets, pattern)
+        except asyncio.CancelledError:
+            self._refresh(", search cancelled")
+        finally:
             self._pattern.props(remove="readonly")
-            self._grid.call_api_method("hideOverlay")
 
     async def _handle_double_click(self, e: events.GenericEventArguments) -> None:
         await self._start_download(e)
@@ -0,0 +1,326 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+from contextlib import asynccontextmanager
+import asyncio
+import time
+import asyncssh
+import logging
+
+logger = logging.getLogger(__name__)
+
+keepalive_interval: int = 30
+_connections: Dict[str, asyncssh.SSHClientConnection] = {}
+_locks: Dict[str, asyncio.Lock] = {}
+stats: Dict[str, Dict[str, int]] = {}
+sftp_idle_timeout: float = 60
+sftp_max_sessions: int = 4
+_sftp_idle: Dict[str, List[Tuple[asyncssh.SFTPClient, asyncssh.SSHClientConnection, float]]] = {}
+_sftp_slots: Dict[str, asyncio.Semaphore] = {}
+_sftp_browse: Dict[str, Tuple[asyncssh.SFTPClient, asyncssh.SSHClientConnection]] = {}
+_sftp_browse_locks: Dict[str, asyncio.Lock] = {}
+_sftp_browse_active: Dict[str, int] = {}
+_sftp_browse_released: Dict[str, float] = {}
+
+
+class _Client(asyncssh.SSHClient):
+    def __init__(self, host: str) -> None:
+        self._host: str = host
+        self._connection: Optional[asyncssh.SSHClientConnection] = None
+
+    def connection_made(self, conn: asyncssh.SSHClientConnection) -> None:
+        self._connection = conn
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if exc is not None:
+            logger.warning(f"Connection to {self._host} lost: {exc}")
+        if _connections.get(self._host) is self._connection:
+            del _connections[self._host]
+
+
+class Process:
+    def __init__(self, process: asyncssh.SSHClientProcess, connection: Optional[asyncssh.SSHClientConnection] = None) -> None:
+        self._process: asyncssh.SSHClientProcess = process
+        self._connection: Optional[asyncssh.SSHClientConnection] = connection
+        self._closed: bool = False
+        self.stdout = process.stdout
+        self.stderr = process.stderr
+
+    @property
+    def returncode(self) -> Union[int, None]:
+        returncode = self._process.returncode
+        if returncode is None and self._closed:
+            return -1
+        return returncode
+
+    async def wait(self) -> Union[int, None]:
+        await self._process.wait_closed()
+        self._closed = True
+        if self._connection is not None:
+            self._connection.close()
+        return self.returncode
+
+    def terminate(self) -> None:
+        try:
+            self._process.terminate()
+        except OSError:
+            pass
+        self._process.close()
+
+    def kill(self) -> None:
+        try:
+            self._process.kill()
+        except OSError:
+            pass
+        self._process.channel.abort()
+
+
+class FailedProcess:
+    def __init__(self, message: str) -> None:
+        self.returncode: int = 255
+        self.stdout: asyncio.StreamReader = asyncio.StreamReader()
+        self.stdout.feed_eof()
+        self.stderr: asyncio.StreamReader = asyncio.StreamReader()
+        self.stderr.feed_data(f"{message}\n".encode())
+        self.stderr.feed_eof()
+
+    async def wait(self) -> int:
+        return self.returncode
+
+    def terminate(self) -> None:
+        pass
+
+    def kill(self) -> None:
+        pass
+
+
+def _stats(host: str) -> Dict[str, int]:
+    if host not in stats:
+        stats[host] = {"reused": 0, "handshakes": 0, "channels": 0, "sftp_reused": 0, "sftp_sessions": 0, "sftp_expired": 0}
+    return stats[host]
+
+
+async def _create_connection(
+    host: str,
+    hostname: str,
+    username: str,
+    key_path: str,
+    password: Optional[str] = None,
+    port: int = 22,
+    config_path: Optional[str] = None,
+) -> asyncssh.SSHClientConnection:
+    _stats(host)["handshakes"] += 1
+    options: Dict[str, Any] = {"port": port, "username": username, "password": password, "client_keys": [key_path], "known_hosts": None, "keepalive_interval": keepalive_interval}
+    if config_path is not None:
+        connection, _ = await asyncssh.create_connection(lambda: _Client(host), host, config=[config_path], **options)
+    else:
+        connection, _ = await asyncssh.create_connection(lambda: _Client(host), hostname, **options)
+    return connection
+
+
+async def connect(
+    host: str,
+    hostname: str,
+    username: str,
+    key_path: str,
+    password: Optional[str] = None,
+    port: int = 22,
+    config_path: Optional[str] = None,
+) -> asyncssh.SSHClientConnection:
+    if host not in _locks:
+        _locks[host] = asyncio.Lock()
+    async with _locks[host]:
+        if host in _connections:
+            _stats(host)["reused"] += 1
+        else:
+            _connections[host] = await _create_connection(host, hostname, username, key_path, password, port, config_path)
+        return _connections[host]
+
+
+def _discard(host: str, connection: asyncssh.SSHClientConnection) -> None:
+    if _connections.get(host) is connection:
+        del _connections[host]
+    connection.close()
+
+
+async def _create_process(
+    host: str,
+    hostname: str,
+    username: str,
+    key_path: str,
+    command: str,
+    password: Optional[str] = None,
+    port: int = 22,
+    config_path: Optional[str] = None,
+) -> Process:
+    connection = await connect(host, hostname, username, key_path, password, port, config_path)
+    try:
+        process = await connection.create_process(command, stdin=asyncssh.DEVNULL, encoding=None)
+    except asyncssh.ConnectionLost:
+        _discard(host, connection)
+        connection = await connect(host, hostname, username, key_path, password, port, config_path)
+        process = await connection.create_process(command, stdin=asyncssh.DEVNULL, encoding=None)
+    except asyncssh.ChannelOpenError as e:
+        logger.info(f"No channel available on the pooled connection to {host} ({e.reason}), opening a dedicated connection.")
+        connection = await _create_connection(host, hostname, username, key_path, password, port, config_path)
+        try:
+            process = await connection.create_process(command, stdin=asyncssh.DEVNULL, encoding=None)
+        except BaseException:
+            connection.close()
+            raise
+        _stats(host)["channels"] += 1
+        return Process(process, connection)
+    _stats(host)["channels"] += 1
+    return Process(process)
+
+
+async def create_process(
+    host: str,
+    hostname: str,
+    username: str,
+    key_path: str,
+    command: str,
+    password: Optional[str] = None,
+    port: int = 22,
+    config_path: Optional[str] = None,
+) -> Union[Process, FailedProcess]:
+    try:
+        return await _create_process(host, hostname, username, key_path, command, password, port, config_path)
+    except (OSError, asyncio.TimeoutError, asyncssh.Error) as e:
+        logger.warning(f"Unable to run command on {host}: {e}")
+        return FailedProcess(f"ssh: {host}: {e}")
+
+
+def _expire_sftp(host: str, max_idle: Optional[float] = None) -> None:
+    max_idle = sftp_idle_timeout if max_idle is None else max_idle
+    now = time.monotonic()
+    idle = []
+    for client, connection, released in _sftp_idle.get(host, []):
+        if now - released >= max_idle or _connections.get(host) is not connection:
+            client.exit()
+            _stats(host)["sftp_expired"] += 1
+        else:
+            idle.append((client, connection, released))
+    _sftp_idle[host] = idle
+
+
+def _expire_browse(host: str, max_idle: Optional[float] = None) -> None:
+    max_idle = sftp_idle_timeout if max_idle is None else max_idle
+    if host in _sftp_browse and _sftp_browse_active.get(host, 0) == 0 and time.monotonic() - _sftp_browse_released.get(host, 0) >= max_idle:
+        _release_sftp(host, *_sftp_browse.pop(host))
+        _stats(host)["sftp_expired"] += 1
+
+
+async def _start_sftp(
+    host: str,
+    hostname: str,
+    username: str,
+    key_path: str,
+    password: Optional[str] = None,
+    port: int = 22,
+    config_path: Optional[str] = None,
+) -> Tuple[asyncssh.SFTPClient, asyncssh.SSHClientConnection]:
+    connection = await connect(host, hostname, username, key_path, password, port, config_path)
+    try:
+        client = await connection.start_sftp_client()
+    except asyncssh.ConnectionLost:
+        _discard(host, connection)
+        connection = await connect(host, hostname, username, key_path, password, port, config_path)
+        client = await connection.start_sftp_client()
+    except asyncssh.ChannelOpenError as e:
+        logger.info(f"No channel available on the pooled connection to {host} ({e.reason}), opening a dedicated connection.")
+        connection = await _create_connection(host, hostname, username, key_path, password, port, config_path)
+        try:
+            client = await connection.start_sftp_client()
+        except BaseException:
+            connection.close()
+            raise
+    _stats(host)["sftp_sessions"] += 1
+    return client, connection
+
+
+def _release_sftp(host: str, client: asyncssh.SFTPClient, connection: asyncssh.SSHClientConnection) -> None:
+    client.exit()
+    if connection is not _connections.get(host):
+        connection.close()
+
+
+async def _browse_sftp(
+    host: str,
+    hostname: str,
+    username: str,
+    key_path: str,
+    password: Optional[str] = None,
+    port: int = 22,
+    config_path: Optional[str] = None,
+) -> asyncssh.SFTPClient:
+    if host not in _sftp_browse_locks:
+        _sftp_browse_locks[host] = asyncio.Lock()
+    async with _sftp_browse_locks[host]:
+        _expire_browse(host)
+        if host in _sftp_browse:
+            client, connection = _sftp_browse[host]
+            if _connections.get(host) is connection:
+                _stats(host)["sftp_reused"] += 1
+                return client
+            _release_sftp(host, *_sftp_browse.pop(host))
+        _sftp_browse[host] = await _start_sftp(host, hostname, username, key_path, password, port, config_path)
+        return _sftp_browse[host][0]
+
+
+@asynccontextmanager
+async def sftp(
+    host: str,
+    hostname: str,
+    username: str,
+    key_path: str,
+    password: Optional[str] = None,
+    port: int = 22,
+    config_path: Optional[str] = None,
+    browse: bool = False,
+) -> AsyncIterator[asyncssh.SFTPClient]:
+    if browse:
+        client = await _browse_sftp(host, hostname, username, key_path, password, port, config_path)
+        _sftp_browse_active[host] = _sftp_browse_active.get(host, 0) + 1
+        try:
+            yield client
+        except asyncssh.SFTPConnectionLost:
+            if host in _sftp_browse and _sftp_browse[host][0] is client:
+                _release_sftp(host, *_sftp_browse.pop(host))
+            raise
+        finally:
+            _sftp_browse_active[host] -= 1
+            _sftp_browse_released[host] = time.monotonic()
+            asyncio.get_running_loop().call_later(sftp_idle_timeout, _expire_browse, host)
+        return
+    if host not in _sftp_slots:
+        _sftp_slots[host] = asyncio.Semaphore(sftp_max_sessions)
+    async with _sftp_slots[host]:
+        _expire_sftp(host)
+        if len(_sftp_idle[host]) > 0:
+            client, connection, _ = _sftp_idle[host].pop()
+            _stats(host)["sftp_reused"] += 1
+        else:
+            client, connection = await _start_sftp(host, hostname, username, key_path, password, port, config_path)
+        reuse = True
+        try:
+            yield client
+        except asyncssh.SFTPError as e:
+            reuse = not isinstance(e, asyncssh.SFTPConnectionLost)
+            raise
+        except BaseException:
+            reuse = False
+            raise
+        finally:
+            if reuse and _connections.get(host) is connection:
+                _sftp_idle[host].append((client, connection, time.monotonic()))
+                asyncio.get_running_loop().call_later(sftp_idle_timeout, _expire_sftp, host)
+            else:
+                _release_sftp(host, client, connection)
+
+
+def close(host: str) -> None:
+    _expire_sftp(host, 0)
+    if host in _sftp_browse:
+        _release_sftp(host, *_sftp_browse.pop(host))
+    connection = _connections.pop(host, None)
+    if connection is not None:
+        connection.close()
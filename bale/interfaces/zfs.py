@@ -1,9 +1,10 @@
-from typing import Any, Dict, Optional, Union
-import re
-from datetime import datetime
-from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import asyncio
+import sys
+import time
+from dataclasses import dataclass, field
 from bale.result import Result
-from bale.interfaces import ssh
+from bale.interfaces import cli, ssh, sshpool
 from bale import elements as el
 import logging
 
@@ -24,16 +25,46 @@ class Snapshot:
     def _recursive(self):
         return " -r" if self.recursive else " "
 
+    @property
+    def filesystem(self) -> str:
+        return self.name.split("@", 1)[0]
+
+    @property
+    def snapshot(self) -> str:
+        return self.name.split("@", 1)[-1]
+
+    @property
+    def batch_key(self) -> Union[Tuple[Any, ...], None]:
+        return None
+
+    @classmethod
+    def batch_command(cls, snapshots: List["Snapshot"]) -> str:
+        return snapshots[0].command
+
 
 @dataclass(kw_only=True)
 class SnapshotCreate(Snapshot):
-    pass
+    @property
+    def batch_key(self) -> Union[Tuple[Any, ...], None]:
+        return (self.action, self.filesystem.split("/", 1)[0], self.recursive)
+
+    @classmethod
+    def batch_command(cls, snapshots: List[Snapshot]) -> str:
+        return f"zfs {snapshots[0].action}{snapshots[0]._recursive} {' '.join(s.name for s in snapshots)}"
 
 
 @dataclass(kw_only=True)
 class SnapshotDestroy(Snapshot):
     action: str = "destroy"
 
+    @property
+    def batch_key(self) -> Union[Tuple[Any, ...], None]:
+        return (self.action, self.filesystem, self.recursive)
+
+    @classmethod
+    def batch_command(cls, snapshots: List[Snapshot]) -> str:
+        return f"zfs {snapshots[0].action}{snapshots[0]._recursive} {snapshots[0].filesystem}@{','.join(s.snapshot for s in snapshots)}"
+
 
 @dataclass(kw_only=True)
 class SnapshotRename(Snapshot):
@@ -54,12 +85,32 @@ class SnapshotHold(Snapshot):
     def command(self):
         return f"zfs {self.action}{self._recursive} {self.tag} {self.name}"
 
+    @property
+    def batch_key(self) -> Union[Tuple[Any, ...], None]:
+        return (self.action, self.tag, self.recursive)
+
+    @classmethod
+    def batch_command(cls, snapshots: List[Snapshot]) -> str:
+        return f"zfs {snapshots[0].action}{snapshots[0]._recursive} {snapshots[0].tag} {' '.join(s.name for s in snapshots)}"
+
 
 @dataclass(kw_only=True)
 class SnapshotRelease(SnapshotHold):
     action: str = "release"
 
 
+@dataclass(kw_only=True, slots=True)
+class SnapshotRecord:
+    filesystem: str
+    name: str
+    used_bytes: int
+    creation: int
+    userrefs: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"filesystem": self.filesystem, "name": self.name, "used_bytes": self.used_bytes, "creation": self.creation, "userrefs": self.userrefs}
+
+
 def format_bytes(size: Union[int, float]) -> str:
     # 2**10 = 1024
     power = 2**10
@@ -72,10 +123,76 @@ def format_bytes(size: Union[int, float]) -> str:
     return f"{s}{suffixs[n]}B"
 
 
+def parse_columns(lines: List[str], count: int) -> List[List[str]]:
+    rows = [row for row in "".join(lines).split("\n") if row != ""]
+    fields = [row.split("\t", count - 1) for row in rows]
+    fields = [f for f in fields if len(f) == count]
+    if len(fields) == 0:
+        return [[] for _ in range(count)]
+    return [list(column) for column in zip(*fields)]
+
+
+@dataclass(kw_only=True)
+class PropertyIndex:
+    datasets: Dict[str, Dict[str, Tuple[str, str]]] = field(default_factory=dict)
+
+    def update(self, lines: List[str]) -> None:
+        names, properties, values, sources = parse_columns(lines, 4)
+        for name, prop, value, source in zip(names, properties, values, sources):
+            name = sys.intern(name)
+            if name not in self.datasets:
+                self.datasets[name] = {}
+            self.datasets[name][sys.intern(prop)] = (value, sys.intern(source))
+
+    def get(self, dataset: str, prop: str) -> Union[str, None]:
+        value = self.datasets.get(dataset, {}).get(prop)
+        return value[0] if value is not None else None
+
+    def query(self, prop: str, value: Union[str, None] = None, source: Union[str, None] = None) -> List[str]:
+        datasets = []
+        for name, properties in self.datasets.items():
+            if prop in properties:
+                if value is not None and properties[prop][0] != value:
+                    continue
+                if source is not None and not properties[prop][1].startswith(source):
+                    continue
+                datasets.append(name)
+        return datasets
+
+
+def chunk_arguments(arguments: List[str], max_length: int) -> List[List[str]]:
+    chunks: List[List[str]] = []
+    length = 0
+    for argument in arguments:
+        if len(chunks) > 0 and length + len(argument) + 1 <= max_length:
+            chunks[-1].append(argument)
+            length += len(argument) + 1
+        else:
+            chunks.append([argument])
+            length = len(argument) + 1
+    return chunks
+
+
 class Zfs:
     def __init__(self) -> None:
-        self._last_run_time: Dict[str, datetime] = {}
-        self._last_data: Dict[str, Any] = {}
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._generation: Dict[str, int] = {}
+        self.query_ttl: Dict[str, float] = {"filesystems": 60, "snapshots": 60, "holds": 60, "properties": 60}
+        self.query_stats: Dict[str, int] = {"hits": 0, "misses": 0, "coalesced": 0}
+        self._inventory: Dict[str, Dict[str, SnapshotRecord]] = {}
+        self._inventory_state: Dict[str, str] = {}
+        self._inventory_time: float = 0
+        self.inventory_refresh: int = 600
+        self.inventory_max_partial: int = 64
+        self.inventory_supported: bool = True
+        self.inventory_stats: Dict[str, int] = {"hits": 0, "misses": 0, "full": 0, "partial": 0}
+        self.stream_chunk: int = 2000
+        self.max_arguments_length: int = 32768
+        self.indexed_properties: Union[List[str], None] = None
+        self.holds_concurrency: int = 4
+        self._hold_index: Dict[str, List[str]] = {}
+        self.snapshot_listeners: List[Callable[[List[SnapshotRecord]], Any]] = []
 
     def notify(self, command: str):
         command = command if len(command) < 160 else command[:160] + "..."
@@ -86,160 +203,276 @@ class Zfs:
             self.notify(command)
         return Result(command=command)
 
+    def _ttl(self, query: str) -> float:
+        return self.query_ttl.get(query.partition(":")[0], 60)
+
+    def cached(self, query: str) -> Union[Any, None]:
+        if query in self._cache:
+            timestamp, data = self._cache[query]
+            if time.monotonic() - timestamp < self._ttl(query):
+                return data
+        return None
+
+    async def _query(self, query: str, fetch: Callable[[], Awaitable[Result]]) -> Result:
+        data = self.cached(query)
+        if data is not None:
+            self.query_stats["hits"] += 1
+            return Result(data=data, cached=True)
+        if query in self._inflight:
+            self.query_stats["coalesced"] += 1
+            result = await asyncio.shield(self._inflight[query])
+            return Result(name=result.name, command=result.command, return_code=result.return_code, data=result.data, cached=True)
+        self.query_stats["misses"] += 1
+        generation = self._generation.get(query, 0)
+        future = asyncio.ensure_future(fetch())
+        self._inflight[query] = future
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            if self._inflight.get(query) is future:
+                del self._inflight[query]
+        if result.return_code == 0 and self._generation.get(query, 0) == generation:
+            self._cache[query] = (time.monotonic(), result.data)
+        return result
+
     def invalidate_query(self, query: Union[str, None] = None):
-        if query is None:
-            self._last_run_time = {}
+        keys = list(self._cache.keys()) + list(self._inflight.keys())
+        for key in keys:
+            if query is None or key == query or key.startswith(f"{query}:"):
+                self._cache.pop(key, None)
+                self._generation[key] = self._generation.get(key, 0) + 1
+
+    def invalidate_snapshots(self, filesystem: Union[str, None] = None, recursive: bool = True):
+        if filesystem is None:
+            self._inventory_state = {}
         else:
-            if query in self._last_run_time:
-                del self._last_run_time[query]
-
-    def is_query_ready_to_execute(self, query: str, timeout: int):
-        now = datetime.now()
-        if query in self._last_run_time and query in self._last_data:
-            if (now - self._last_run_time[query]).total_seconds() > timeout:
-                return True
-            else:
-                return False
-        else:
-            return True
+            for fs in list(self._inventory_state.keys()):
+                if fs == filesystem or (recursive and fs.startswith(f"{filesystem}/")):
+                    del self._inventory_state[fs]
+        self.invalidate_query("snapshots")
+        self.invalidate_query("holds")
+
+    async def _properties(self) -> Result:
+        properties = ",".join(sorted(set(self.indexed_properties or []) | {"type", "used", "available", "referenced", "mountpoint"}))
+        result, local = await asyncio.gather(
+            self.execute(f"zfs get -Hp -t filesystem,volume -o name,property,value,source {properties}", notify=False),
+            self.execute("zfs get -Hp -s local -t filesystem,volume -o name,property,value,source all", notify=False),
+        )
+        index = PropertyIndex()
+        index.update(result.stdout_lines)
+        index.update([line for line in local.stdout_lines if ":" in line.partition("\t")[2].partition("\t")[0]])
+        result = local if result.return_code == 0 and local.return_code != 0 else result
+        result.data = index
+        return result
 
-    def set_query_time(self, query: str):
-        self._last_run_time[query] = datetime.now()
+    async def properties(self) -> Result:
+        return await self._query("properties", self._properties)
+
+    async def _refresh_property(self, prop: str, filesystems: List[str]) -> None:
+        index = self.cached("properties")
+        if index is None:
+            return
+        for chunk in chunk_arguments(filesystems, self.max_arguments_length):
+            result = await self.execute(f"zfs get -Hp -r -t filesystem,volume -o name,property,value,source {prop} {' '.join(chunk)}", notify=False)
+            if result.return_code != 0:
+                self.invalidate_query("properties")
+                return
+            index.update(result.stdout_lines)
+
+    async def set_property(self, prop: str, value: str, filesystems: List[str]) -> List[Result]:
+        results = []
+        for chunk in chunk_arguments(filesystems, self.max_arguments_length):
+            results.append(await self.execute(f"zfs set {prop}={value} {' '.join(chunk)}"))
+        await self._refresh_property(prop, filesystems)
+        return results
+
+    async def inherit_property(self, prop: str, filesystems: List[str]) -> List[Result]:
+        results = []
+        for chunk in chunk_arguments(filesystems, self.max_arguments_length):
+            results.append(await self.execute(f"zfs inherit {prop} {' '.join(chunk)}"))
+        await self._refresh_property(prop, filesystems)
+        return results
 
     async def add_filesystem_prop(self, filesystem: str, prop: str, value: str) -> Result:
-        result = await self.execute(f"zfs set {prop}={value} {filesystem}")
-        return result
+        results = await self.set_property(prop, value, [filesystem])
+        return results[0]
 
     async def remove_filesystem_prop(self, filesystem: str, prop: str) -> Result:
-        result = await self.execute(f"zfs inherit {prop} {filesystem}")
+        results = await self.inherit_property(prop, [filesystem])
+        return results[0]
+
+    async def filesystems_with_prop(self, prop: str, value: Union[str, None] = None, source: Union[str, None] = "local") -> Result:
+        result = await self.properties()
+        return Result(name=result.name, command=result.command, return_code=result.return_code, data=result.data.query(prop, value, source), cached=result.cached)
+
+    async def _holds(self, snapshots: List[str]) -> Result:
+        if len(snapshots) == 0:
+            return Result(data={})
+        slots = asyncio.Semaphore(self.holds_concurrency)
+
+        async def holds(chunk: List[str]) -> Result:
+            async with slots:
+                return await self.execute(f"zfs holds -H -r {' '.join(chunk)}", notify=False)
+
+        results = await asyncio.gather(*[holds(chunk) for chunk in chunk_arguments(snapshots, self.max_arguments_length)])
+        tags: Dict[str, List[str]] = {}
+        for result in results:
+            names, hold_tags, _ = parse_columns(result.stdout_lines, 3)
+            for name, tag in zip(names, hold_tags):
+                if "@" in name:
+                    if name not in tags:
+                        tags[name] = []
+                    tags[name].append(tag)
+        failed = [result for result in results if result.return_code != 0]
+        result = failed[0] if len(failed) > 0 else results[0]
+        result.data = tags
         return result
 
-    async def filesystems_with_prop(self, prop: str) -> Result:
-        filesystems = []
-        result = await self.execute(f"zfs get -Hp -t filesystem,volume {prop}")
-        for line in result.stdout_lines:
-            matches = re.match("^(?P<name>[^\t]+)\t(?P<property>[^\t]+)\t(?P<value>[^\t]+)\t(?P<source>[^\n]+)", line)
-            if matches is not None:
-                md = matches.groupdict()
-                if md["property"] == prop and md["source"] == "local":
-                    filesystems.append(md["name"])
-        return Result(data=filesystems, cached=False)
+    def _index_holds(self, holds: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        index: Dict[str, List[str]] = {}
+        for name, tags in holds.items():
+            for tag in tags:
+                if tag not in index:
+                    index[tag] = []
+                index[tag].append(name)
+        return index
+
+    async def _all_holds(self) -> Result:
+        snapshots = await self.snapshots
+        result = await self._holds([name for name, data in snapshots.data.items() if data.userrefs > 0])
+        self._hold_index = self._index_holds(result.data)
+        return result
 
-    async def holds_for_snapshot(self, snapshot: Union[str, None] = None) -> Result:
-        query = "holds_for_snapshot"
-        if self.is_query_ready_to_execute(query, 60):
-            with_holds = []
-            if snapshot is None:
-                snapshots = await self.snapshots
-                for _name, _data in snapshots.data.items():
-                    if int(_data["userrefs"]) > 0:
-                        with_holds.append(_name)
-                with_holds = " ".join(with_holds)
-            else:
-                with_holds = snapshot
-            if len(with_holds) > 0:
-                result = await self.execute(f"zfs holds -H -r {with_holds}", notify=False)
-                tags: Dict[str, list[str]] = {}
-                for line in result.stdout_lines:
-                    matches = re.match("^(?P<filesystem>[^@]+)@(?P<name>[^\t]+)\t(?P<tag>[^\t]+)\t(?P<creation>[^\n]+)", line)
-                    if matches is not None:
-                        md = matches.groupdict()
-                        s = f"{md['filesystem']}@{md['name']}"
-                        if s not in tags:
-                            tags[s] = []
-                        tags[s].append(md["tag"])
-                    if query not in self._last_data:
-                        self._last_data[query] = {}
-                    self._last_data[query].update(tags)
-                    if snapshot is None:
-                        result.data = self._last_data[query]
-                    else:
-                        if snapshot in self._last_data[query]:
-                            result.data = self._last_data[query][snapshot]
-                        else:
-                            result.data = []
-            else:
-                return Result(data=[])
+    async def holds_index(self, snapshots: Optional[List[str]] = None) -> Result:
+        if snapshots is None or self.cached("holds") is not None:
+            result = await self.holds_for_snapshot()
+            index = self._hold_index
         else:
-            if snapshot in self._last_data[query]:
-                data = self._last_data[query][snapshot]
-            else:
-                data = []
-            result = Result(data=data, cached=True)
-        self.set_query_time(query)
-        return result
+            result = await self._holds(snapshots)
+            index = self._index_holds(result.data)
+        if snapshots is not None:
+            selected = set(snapshots)
+            index = {tag: [name for name in names if name in selected] for tag, names in index.items()}
+            index = {tag: names for tag, names in index.items() if len(names) > 0}
+        return Result(name=result.name, command=result.command, return_code=result.return_code, data=index, cached=result.cached)
 
-    async def find_files_in_snapshots(self, filesystem: str, pattern: str) -> Result:
-        try:
-            filesystems = await self.filesystems
-            command = f"find {filesystems.data[filesystem]['mountpoint']}/.zfs/snapshot -type f -name '{pattern}' -printf '%h\t%f\t%s\t%T@\n'"
-            result = await self.execute(command=command, notify=False, max_output_lines=1000)
-            files = []
-            for line in result.stdout_lines:
-                matches = re.match(
-                    "^(?P<location>[^\t]+)\t(?P<name>[^\t]+)\t(?P<bytes>[^\t]+)\t(?P<modified_timestamp>[^\n]+)",
-                    line,
-                )
-                if matches is not None:
-                    md = matches.groupdict()
-                    md["path"] = f"{md['location']}/{md['name']}"
-                    md["bytes"] = int(md["bytes"])
-                    md["size"] = format_bytes(md["bytes"])
-                    md["modified_datetime"] = datetime.fromtimestamp(float(md["modified_timestamp"])).strftime("%Y/%m/%d %H:%M:%S")
-                    md["modified_timestamp"] = float(md["modified_timestamp"])
-                    files.append(md)
-            result.data = files
-            return result
-        except KeyError:
-            pass
-        return Result()
+    async def holds_for_snapshot(self, snapshot: Union[str, None] = None) -> Result:
+        if snapshot is None:
+            return await self._query("holds", self._all_holds)
+        holds = self.cached("holds")
+        if holds is not None:
+            self.query_stats["hits"] += 1
+            return Result(data=holds.get(snapshot, []), cached=True)
+        result = await self._query(f"holds:{snapshot}", lambda: self._holds([snapshot]))
+        data = result.data.get(snapshot, []) if result.data is not None else []
+        return Result(name=result.name, command=result.command, return_code=result.return_code, data=data, cached=result.cached)
+
+    async def _filesystems(self) -> Result:
+        result = await self.properties()
+        index = result.data
+        filesystems = dict()
+        for name in index.query("type", "filesystem"):
+            filesystems[name] = {
+                "used_bytes": index.get(name, "used"),
+                "avail_bytes": index.get(name, "available"),
+                "refer_bytes": index.get(name, "referenced"),
+                "mountpoint": index.get(name, "mountpoint"),
+            }
+        return Result(name=result.name, command=result.command, return_code=result.return_code, data=filesystems)
 
     @property
     async def filesystems(self) -> Result:
-        query = "filesystems"
-        if self.is_query_ready_to_execute(query, 60):
-            result = await self.execute("zfs list -Hp -t filesystem -o name,used,avail,refer,mountpoint", notify=False)
-            filesystems = dict()
+        return await self._query("filesystems", self._filesystems)
+
+    def _parse_snapshots(self, lines: List[str]) -> Dict[str, Dict[str, SnapshotRecord]]:
+        inventory: Dict[str, Dict[str, SnapshotRecord]] = {}
+        names, used, creation, userrefs = parse_columns(lines, 4)
+        for name, used_bytes, created, refs in zip(names, map(int, used), map(int, creation), map(int, userrefs)):
+            filesystem, _, snapshot = name.partition("@")
+            filesystem = sys.intern(filesystem)
+            if filesystem not in inventory:
+                inventory[filesystem] = {}
+            inventory[filesystem][name] = SnapshotRecord(filesystem=filesystem, name=snapshot, used_bytes=used_bytes, creation=created, userrefs=refs)
+        return inventory
+
+    def _flatten_inventory(self) -> Dict[str, SnapshotRecord]:
+        snapshots = dict()
+        for fs_snapshots in self._inventory.values():
+            snapshots.update(fs_snapshots)
+        return snapshots
+
+    async def _snapshots(self) -> Result:
+        state: Dict[str, str] = {}
+        if self.inventory_supported is True:
+            result = await self.execute("zfs get -Hp -t filesystem,volume -o name,value snapshots_changed", notify=False)
             for line in result.stdout_lines:
-                matches = re.match(
-                    "^(?P<filesystem>[^\t]+)\t(?P<used_bytes>[^\t]+)\t(?P<avail_bytes>[^\t]+)\t(?P<refer_bytes>[^\t]+)\t(?P<mountpoint>[^\n]+)",
-                    line,
-                )
-                if matches is not None:
-                    md = matches.groupdict()
-                    filesystem = md.pop("filesystem")
-                    filesystems[filesystem] = md
-            self._last_data[query] = filesystems
-            result.data = self._last_data[query]
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) == 2:
+                    state[fields[0]] = fields[1]
+            if result.return_code != 0 and len(state) == 0:
+                if "invalid property" in result.stderr or "bad property list" in result.stderr:
+                    logger.info("snapshots_changed property not supported, falling back to full snapshot listing.")
+                    self.inventory_supported = False
+                else:
+                    result.data = self._flatten_inventory()
+                    return result
+        changed = [fs for fs, value in state.items() if self._inventory_state.get(fs) != value]
+        if self._inventory_time == 0 or len(state) == 0 or len(changed) > self.inventory_max_partial or time.time() - self._inventory_time > self.inventory_refresh:
+            result, inventory = await self._list_snapshots("zfs list -Hp -t snapshot -o name,used,creation,userrefs", progress=True)
+            if result.return_code != 0:
+                result.data = self._flatten_inventory()
+                return result
+            self._inventory = inventory
+            self._inventory_time = time.time()
+            self.inventory_stats["full"] += 1
+            self.inventory_stats["misses"] += len(state)
         else:
-            result = Result(data=self._last_data[query], cached=True)
-        self.set_query_time(query)
+            if len(changed) > 0:
+                result, inventory = await self._list_snapshots(f"zfs list -Hp -t snapshot -o name,used,creation,userrefs -d 1 {' '.join(changed)}")
+                if result.return_code != 0:
+                    result.data = self._flatten_inventory()
+                    return result
+                for fs in changed:
+                    self._inventory[fs] = inventory.get(fs, {})
+                self.inventory_stats["partial"] += 1
+            for fs in list(self._inventory.keys()):
+                if fs not in state:
+                    del self._inventory[fs]
+            self.inventory_stats["misses"] += len(changed)
+            self.inventory_stats["hits"] += len(state) - len(changed)
+        self._inventory_state = state
+        result.data = self._flatten_inventory()
         return result
 
+    async def _list_snapshots(self, command: str, progress: bool = False) -> Tuple[Result, Dict[str, Dict[str, SnapshotRecord]]]:
+        inventory: Dict[str, Dict[str, SnapshotRecord]] = {}
+        stream = self.stream(command)
+        lines: List[str] = []
+
+        def parse() -> None:
+            chunk = self._parse_snapshots(lines)
+            for fs, fs_snapshots in chunk.items():
+                inventory.setdefault(fs, {}).update(fs_snapshots)
+            if progress is True:
+                records = [record for fs_snapshots in chunk.values() for record in fs_snapshots.values()]
+                for listener in list(self.snapshot_listeners):
+                    listener(records)
+            lines.clear()
+
+        async with stream:
+            async for line in stream:
+                lines.append(line)
+                if len(lines) >= self.stream_chunk:
+                    parse()
+        parse()
+        result = stream.result if stream.result is not None else Result(command=command, return_code=None)
+        if result.stderr != "":
+            el.notify(result.stderr, type="negative")
+        return result, inventory
+
     @property
     async def snapshots(self) -> Result:
-        query = "snapshots"
-        if self.is_query_ready_to_execute(query, 60):
-            result = await self.execute("zfs list -Hp -t snapshot -o name,used,creation,userrefs", notify=False)
-            snapshots = dict()
-            for line in result.stdout_lines:
-                matches = re.match("^(?P<filesystem>[^@]+)@(?P<name>[^\t]+)\t(?P<used_bytes>[^\t]+)\t(?P<creation>[^\t]+)\t(?P<userrefs>[^\n]+)", line)
-                if matches is not None:
-                    md = matches.groupdict()
-                    md["used_bytes"] = int(md["used_bytes"])
-                    md["creation"] = int(md["creation"])
-                    md["creation_date"] = datetime.fromtimestamp(md["creation"]).strftime("%Y/%m/%d")
-                    md["creation_time"] = datetime.fromtimestamp(md["creation"]).strftime("%H:%M")
-                    md["used"] = format_bytes(md["used_bytes"])
-                    md["userrefs"] = int(md["userrefs"])
-                    snapshot = f"{md['filesystem']}@{md['name']}"
-                    snapshots[snapshot] = md
-            self._last_data[query] = snapshots
-            result.data = self._last_data[query]
-        else:
-            result = Result(data=self._last_data[query], cached=True)
-        self.set_query_time(query)
-        return result
+        return await self._query("snapshots", self._snapshots)
 
 
 class Ssh(ssh.Ssh, Zfs):
@@ -252,13 +485,21 @@ class Ssh(ssh.Ssh, Zfs):
         options: Optional[Dict[str, str]] = None,
         path: str = "data",
         seperator: bytes = b"\n",
+        backend: str = "cli",
+        max_concurrent: int = 1,
     ) -> None:
-        super().__init__(host, hostname, username, password, options, path, seperator)
+        super().__init__(host, hostname, username, password, options, path, seperator, backend, max_concurrent)
         Zfs.__init__(self)
 
     def notify(self, command: str):
         super().notify(f"<{self.host}> {command}")
 
+    def log_stats(self) -> None:
+        logger.debug(
+            f"{self.host}: query={self.query_stats} inventory={self.inventory_stats} control={self.connection_stats} "
+            f"pool={sshpool.stats.get(self.host, {})} terminal={cli.terminal_stats}"
+        )
+
     async def execute(self, command: str, max_output_lines: int = 0, notify: bool = True) -> Result:
         if notify:
             self.notify(command)
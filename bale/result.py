@@ -14,6 +14,8 @@ class Result:
     stderr_lines: List[str] = field(default_factory=list)
     terminated: bool = False
     truncated: bool = False
+    timed_out: bool = False
+    log_path: str = ""
     data: Any = None
     trace: str = ""
     cached: bool = False
@@ -60,6 +62,8 @@ class Result:
         self.stdout_lines = d["stdout_lines"]
         self.stderr_lines = d["stderr_lines"]
         self.terminated = d["terminated"]
+        self.timed_out = d.get("timed_out", False)
+        self.log_path = d.get("log_path", "")
         self.data = d["data"]
         self.trace = d["trace"]
         self.cached = d["cached"]
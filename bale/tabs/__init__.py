@@ -7,7 +7,7 @@ import time
 import json
 import httpx
 from nicegui import app, ui  # type: ignore
-from bale.interfaces.zfs import Ssh
+from bale.interfaces.zfs import Snapshot, Ssh
 from bale import elements as el
 from bale.result import Result
 from bale.interfaces import cli
@@ -19,6 +19,8 @@ class Task:
     command: str
     status: str
     host: str
+    filesystem: str = ""
+    operation: Union[Snapshot, None] = None
     result: Union[Result, None] = None
     history: float = field(default_factory=time.time)
     timestamp: float = field(default_factory=time.time)
@@ -71,6 +73,7 @@ class Tab:
     _zfs: Dict[str, Ssh] = {}
     _history: List[Result] = []
     _tasks: List[Task] = []
+    max_concurrent: int = 4
 
     def __init__(self, spinner, host=None) -> None:
         self._spinner: el.Spinner = spinner
@@ -82,8 +85,8 @@ class Tab:
         pass
 
     @classmethod
-    def register_connection(cls, host: str) -> None:
-        cls._zfs[host] = Ssh(host)
+    def register_connection(cls, host: str, backend: str = "cli") -> None:
+        cls._zfs[host] = Ssh(host, backend=backend, max_concurrent=cls.max_concurrent)
 
     async def _display_result(self, result: Result) -> None:
         with ui.dialog() as dialog, el.Card():
@@ -101,6 +104,9 @@ class Tab:
                             )
                             ui.label(f"Timestamp: {timestamp}").classes("text-secondary")
                             ui.label(f"Return Code: {result.return_code}").classes("text-secondary")
+                        if result.log_path != "":
+                            with el.WColumn():
+                                ui.label(f"Full Log: {result.log_path}").classes("text-secondary")
                     with el.Card() as card:
                         with el.WColumn():
                             terminal = cli.Terminal(options={"rows": 18, "cols": 120, "convertEol": True})
@@ -120,12 +126,12 @@ class Tab:
             self._history.pop(0)
         self._history.append(r)
 
-    def _add_task(self, action: str, command: str, hosts: Union[List[str], None] = None) -> List[Task]:
+    def _add_task(self, action: str, command: str, hosts: Union[List[str], None] = None, filesystem: str = "", operation: Union[Snapshot, None] = None) -> List[Task]:
         if hosts is None:
             hosts = [self.host]
         tasks = []
         for host in hosts:
-            tasks.append(Task(action=action, command=command, host=host, status="pending"))
+            tasks.append(Task(action=action, command=command, host=host, filesystem=filesystem, operation=operation, status="pending"))
         self._tasks.extend(tasks)
         return tasks
 
@@ -146,7 +152,7 @@ class Tab:
             self._grid.options["columnDefs"][0]["checkboxSelection"] = True
         elif mode == "multiple":
             row_selection = "multiple"
-            self._grid.options["columnDefs"][0]["headerCheckboxSelection"] = True
+            self._grid.options["columnDefs"][0]["headerCheckboxSelection"] = self._grid.options.get("rowModelType") != "infinite"
             self._grid.options["columnDefs"][0]["checkboxSelection"] = True
         self._grid.options["rowSelection"] = row_selection
         self._grid.update()
@@ -170,6 +176,8 @@ class Tab:
             stdout_lines=result.stdout_lines,
             stderr_lines=result.stderr_lines,
             terminated=result.terminated,
+            timed_out=result.timed_out,
+            log_path=result.log_path,
             data=result.data,
             trace=result.trace,
             cached=result.cached,
@@ -212,3 +220,9 @@ class Tab:
         if "pipes" not in self.common:
             self.common["pipes"] = {}
         return self.common["pipes"]
+
+    @property
+    def backends(self) -> Dict[str, str]:
+        if "backends" not in self.common:
+            self.common["backends"] = {}
+        return self.common["backends"]
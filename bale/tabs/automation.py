@@ -2,6 +2,7 @@ from typing import Any, Callable, Dict, List, Union
 import asyncio
 from datetime import datetime
 import json
+import re
 import string
 from apscheduler.job import Job  # type: ignore
 from apscheduler.triggers.combining import AndTrigger  # type: ignore
@@ -13,6 +14,7 @@ from cron_descriptor import get_description  # type: ignore
 from nicegui import ui, Tailwind, events  # type: ignore
 from . import SelectionConfirm, Tab
 from bale import elements as el
+from bale import grid
 from bale.result import Result
 from bale.interfaces import cli
 from bale.interfaces import ssh
@@ -48,9 +50,12 @@ def populate_job_handler(app: str, job_id: str, host: str):
     tab = Tab(host=None, spinner=None)
     if job_id not in job_handlers:
         if app == "remote":
-            job_handlers[job_id] = ssh.Ssh(host)
+            job_handlers[job_id] = ssh.Ssh(host, backend=tab.backends.get(host, "cli"))
         else:
             job_handlers[job_id] = cli.Cli()
+        if app == "zfs_autobackup":
+            job_handlers[job_id].capture_lines = 1000
+            job_handlers[job_id].log_dir = f"data/logs/{re.sub('[^A-Za-z0-9_.@-]', '_', job_id)}"
     return job_handlers[job_id]
 
 
@@ -65,7 +70,7 @@ async def automation_job(**kwargs) -> None:
         tab = Tab(host=None, spinner=None)
         if auto.app == "zfs_autobackup":
             populate_job_handler(app=auto.app, job_id=auto.id, host=auto.host)
-            if job_handlers[auto.id].is_busy is False:
+            if job_handlers[auto.id].at_capacity is False:
                 result = await job_handlers[auto.id].execute(command.safe_substitute(name=auto.name, host=auto.host))
                 result.name = auto.host
                 result.status = "success" if result.return_code == 0 else "error"
@@ -78,7 +83,7 @@ async def automation_job(**kwargs) -> None:
                 logger.warning("Job Skipped!")
         elif auto.app == "remote":
             populate_job_handler(app=auto.app, job_id=auto.id, host=auto.host)
-            if job_handlers[auto.id].is_busy is False:
+            if job_handlers[auto.id].at_capacity is False:
                 result = await job_handlers[auto.id].execute(command.safe_substitute(name=auto.name, host=auto.host))
                 result.name = auto.host
                 if auto.pipe_success is True and result.status == "success":
@@ -90,7 +95,7 @@ async def automation_job(**kwargs) -> None:
                 logger.warning("Job Skipped!")
         elif auto.app == "local":
             populate_job_handler(app=auto.app, job_id=auto.id, host=auto.host)
-            if job_handlers[auto.id].is_busy is False:
+            if job_handlers[auto.id].at_capacity is False:
                 result = await job_handlers[auto.id].execute(command.safe_substitute(name=auto.name, host=auto.host))
                 result.name = auto.host
                 if auto.pipe_success is True and result.status == "success":
@@ -208,6 +213,7 @@ class Automation(Tab):
             )
             self._grid.tailwind().width("full").height("5/6")
             self._grid.on("cellClicked", lambda e: self._display_job(e))
+            self._delta = grid.Delta("name")
             self._update_automations()
 
     async def _display_job(self, job_data) -> None:
@@ -260,7 +266,7 @@ class Automation(Tab):
             auto = automation(job)
             if auto is not None and auto.host == self.host:
                 self._automations.append({"name": auto.name, "command": auto.command, "next_run": next_run, "status": ""})
-        self._grid.update()
+        self._delta.apply(self._grid, self._automations)
 
     async def _remove_automation(self) -> None:
         self._set_selection(mode="multiple")
@@ -280,7 +286,7 @@ class Automation(Tab):
                                 await self._remove_prop_from_all_fs(host=host, prop=prop)
                         self.scheduler.scheduler.remove_job(job.id)
                 self._automations.remove(row)
-            self._grid.update()
+            self._delta.apply(self._grid, self._automations)
         self._set_selection()
 
     async def _run_automation(self) -> None:
@@ -304,17 +310,16 @@ class Automation(Tab):
         self._set_selection()
 
     async def _add_prop_to_fs(self, host: str, prop: str, value: str, filesystems: Union[List[str], None] = None) -> None:
-        if filesystems is not None:
-            for fs in filesystems:
-                result = await self._zfs[host].add_filesystem_prop(filesystem=fs, prop=prop, value=value)
+        if filesystems is not None and len(filesystems) > 0:
+            for result in await self._zfs[host].set_property(prop=prop, value=value, filesystems=filesystems):
                 self.add_history(result=result)
 
     async def _remove_prop_from_all_fs(self, host: str, prop: str) -> None:
         filesystems_with_prop_result = await self._zfs[host].filesystems_with_prop(prop)
         filesystems_with_prop = list(filesystems_with_prop_result.data)
-        for fs in filesystems_with_prop:
-            result = await self._zfs[host].remove_filesystem_prop(filesystem=fs, prop=prop)
-            self.add_history(result=result)
+        if len(filesystems_with_prop) > 0:
+            for result in await self._zfs[host].inherit_property(prop=prop, filesystems=filesystems_with_prop):
+                self.add_history(result=result)
 
     async def _create_automation(self, name: str = "") -> None:
         tw_rows = Tailwind().width("full").align_items("center").justify_content("between")
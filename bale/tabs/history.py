@@ -4,6 +4,7 @@ from nicegui import ui, events  # type: ignore
 import httpx
 from . import SelectionConfirm, Tab
 from bale import elements as el
+from bale import grid
 from bale.result import Result
 from bale.interfaces import zfs
 import logging
@@ -27,7 +28,7 @@ class History(Tab):
                     el.SmButton(text="Remove", on_click=self._remove_history)
                     el.SmButton(text="HTTP Pipe", on_click=self._setup_http_pipe)
                 with ui.row().classes("items-center"):
-                    el.SmButton(text="Refresh", on_click=lambda _: self._grid.update())
+                    el.SmButton(text="Refresh", on_click=self.update_history)
             self._grid = ui.aggrid(
                 {
                     "suppressRowClickSelection": True,
@@ -81,9 +82,10 @@ class History(Tab):
             )
             self._grid.tailwind().width("full").height("5/6")
             self._grid.on("cellClicked", lambda e: display_result(e))
+            self._delta = grid.Delta("name", "timestamp", "command")
 
     def update_history(self):
-        self._grid.update()
+        self._delta.apply(self._grid, self._history)
 
     async def _remove_history(self):
         self._set_selection(mode="multiple")
@@ -92,7 +94,7 @@ class History(Tab):
             rows = await self._grid.get_selected_rows()
             for row in rows:
                 self._history.remove(row)
-            self._grid.update()
+            self.update_history()
         self._set_selection()
 
     async def _setup_http_pipe(self):
@@ -1,17 +1,22 @@
+from typing import Any, Callable, Dict, List, Optional
 import asyncio
 from copy import deepcopy
 from nicegui import background_tasks, ui  # type: ignore
 from . import SelectionConfirm, Tab, Task
 from bale.result import Result
 from bale import elements as el
+from bale import grid
 from bale.interfaces import zfs
 from bale.interfaces import sshdl
+from bale.executor import TaskExecutor
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class Manage(Tab):
+    server_side_rows: int = 5000
+
     def _build(self):
         def set_auto(value: bool) -> None:
             self.common.update({"auto": value})
@@ -49,7 +54,7 @@ class Manage(Tab):
                     self._auto.props("left-label keep-color color=primary")
                     self._auto.tailwind.text_color("primary")
                     el.SmButton(text="Tasks", on_click=self._display_tasks)
-                    el.SmButton(text="Refresh", on_click=self.display_snapshots)
+                    el.SmButton(text="Refresh", on_click=lambda: self.display_snapshots(refresh=True))
             self._grid = ui.aggrid(
                 {
                     "suppressRowClickSelection": True,
@@ -72,10 +77,16 @@ class Manage(Tab):
                         {"headerName": "Filesystem", "field": "filesystem", "filter": "agTextColumnFilter", "flex": 1},
                         {
                             "headerName": "Used",
-                            "field": "used",
+                            "field": "used_bytes",
                             "maxWidth": 100,
-                            ":comparator": """(valueA, valueB, nodeA, nodeB, isInverted) => {
-                                return (nodeA.data.used_bytes > nodeB.data.used_bytes) ? -1 : 1;
+                            ":valueFormatter": """(data) => {
+                                var size = data.value;
+                                var n = 0;
+                                while (size > 1024) {
+                                    size = size / 1024;
+                                    n++;
+                                }
+                                return parseFloat(size.toFixed(3)) + ["", "K", "M", "G", "T"][n] + "B";
                             }""",
                         },
                         {
@@ -96,15 +107,36 @@ class Manage(Tab):
                 theme="balham-dark",
             )
             self._grid.tailwind().width("full").height("5/6")
+            self._snapshots: Dict[str, zfs.SnapshotRecord] = {}
+            self._delta = grid.Delta("filesystem", "name")
+            self._source = grid.register_source(f"snapshots-{self.host}", lambda: list(self._snapshots.values()))
+
+    def _show_partial_snapshots(self, records: List[zfs.SnapshotRecord]) -> None:
+        self._partial.extend(record.to_dict() for record in records)
+        if len(self._partial) <= self.server_side_rows:
+            self._delta.apply(self._grid, self._partial)
 
-    async def display_snapshots(self):
+    async def display_snapshots(self, refresh: bool = False):
         self._spinner.visible = True
-        self.zfs.invalidate_query()
-        snapshots = await self.zfs.snapshots
+        if refresh:
+            self.zfs.invalidate_snapshots()
+        self._partial: List[Dict[str, Any]] = []
+        listen = len(self._snapshots) == 0
+        if listen:
+            self.zfs.snapshot_listeners.append(self._show_partial_snapshots)
+        try:
+            snapshots = await self.zfs.snapshots
+        finally:
+            if listen:
+                self.zfs.snapshot_listeners.remove(self._show_partial_snapshots)
         background_tasks.create(self.zfs.filesystems, name="zfs_filesystems")
         background_tasks.create(self.zfs.holds_for_snapshot(), name="zfs_holds")
-        self._grid.options["rowData"] = list(snapshots.data.values())
-        self._grid.update()
+        self._snapshots = snapshots.data
+        if len(self._snapshots) > self.server_side_rows:
+            grid.server_side(self._grid, self._source)
+        else:
+            self._delta.apply(self._grid, [snapshot.to_dict() for snapshot in self._snapshots.values()])
+        self.zfs.log_stats()
         self._spinner.visible = False
 
     async def _browse(self) -> None:
@@ -121,7 +153,7 @@ class Manage(Tab):
         self._set_selection()
 
     async def _find(self) -> None:
-        await sshdl.SshFileFind(zfs=self.zfs)
+        await sshdl.SshFileFind(zfs=self.zfs, hosts=self._zfs)
 
     async def _create_snapshot(self):
         with ui.dialog() as dialog, el.Card():
@@ -140,16 +172,21 @@ class Manage(Tab):
 
         result = await dialog
         if result == "create":
+            tasks = []
             for filesystem in filesystems.value:
-                tasks = self._add_task(
-                    "create",
-                    zfs.SnapshotCreate(name=f"{filesystem}@{name.value}", recursive=recursive.value).command,
-                    hosts=zfs_hosts.value,
+                operation = zfs.SnapshotCreate(name=f"{filesystem}@{name.value}", recursive=recursive.value)
+                tasks.extend(
+                    self._add_task(
+                        "create",
+                        operation.command,
+                        hosts=zfs_hosts.value,
+                        filesystem=filesystem,
+                        operation=operation,
+                    )
                 )
-                if self._auto.value is True:
-                    for task in tasks:
-                        await self._run_task(task=task, spinner=self._spinner)
-                    await self.display_snapshots()
+            if self._auto.value is True:
+                await self._run_tasks(tasks=tasks, spinner=self._spinner)
+                await self.display_snapshots()
 
     async def _destroy_snapshot(self):
         with ui.dialog() as dialog, el.Card():
@@ -165,16 +202,21 @@ class Manage(Tab):
             result = await dialog
             if result == "destroy":
                 rows = await self._grid.get_selected_rows()
+                tasks = []
                 for row in rows:
-                    tasks = self._add_task(
-                        "destroy",
-                        zfs.SnapshotDestroy(name=f"{row['filesystem']}@{row['name']}", recursive=recursive.value).command,
-                        hosts=zfs_hosts.value,
+                    operation = zfs.SnapshotDestroy(name=f"{row['filesystem']}@{row['name']}", recursive=recursive.value)
+                    tasks.extend(
+                        self._add_task(
+                            "destroy",
+                            operation.command,
+                            hosts=zfs_hosts.value,
+                            filesystem=row["filesystem"],
+                            operation=operation,
+                        )
                     )
-                    if self._auto.value is True:
-                        for task in tasks:
-                            await self._run_task(task=task, spinner=self._spinner)
-                        await self.display_snapshots()
+                if self._auto.value is True:
+                    await self._run_tasks(tasks=tasks, spinner=self._spinner)
+                    await self.display_snapshots()
         self._set_selection()
 
     async def _rename_snapshot(self):
@@ -195,23 +237,28 @@ class Manage(Tab):
             result = await dialog
             if result == "rename":
                 rows = await self._grid.get_selected_rows()
+                tasks = []
                 for row in rows:
                     if mode.value == "full":
                         rename = new_name.value
                     if mode.value == "replace":
                         rename = row["name"].replace(original.value, replace.value)
                     if row["name"] != rename:
-                        tasks = self._add_task(
-                            "rename",
-                            zfs.SnapshotRename(name=f"{row['filesystem']}@{row['name']}", new_name=rename, recursive=recursive.value).command,
-                            hosts=zfs_hosts.value,
+                        operation = zfs.SnapshotRename(name=f"{row['filesystem']}@{row['name']}", new_name=rename, recursive=recursive.value)
+                        tasks.extend(
+                            self._add_task(
+                                "rename",
+                                operation.command,
+                                hosts=zfs_hosts.value,
+                                filesystem=row["filesystem"],
+                                operation=operation,
+                            )
                         )
-                        if self._auto.value is True:
-                            for task in tasks:
-                                await self._run_task(task=task, spinner=self._spinner)
-                            await self.display_snapshots()
                     else:
                         el.notify(f"Skipping rename of {row['filesystem']}@{row['name']}!")
+                if self._auto.value is True and len(tasks) > 0:
+                    await self._run_tasks(tasks=tasks, spinner=self._spinner)
+                    await self.display_snapshots()
         self._set_selection()
 
     async def _hold_snapshot(self):
@@ -229,20 +276,25 @@ class Manage(Tab):
             result = await dialog
             if result == "hold":
                 rows = await self._grid.get_selected_rows()
+                tasks = []
                 for row in rows:
-                    tasks = self._add_task(
-                        "hold",
-                        zfs.SnapshotHold(
-                            name=f"{row['filesystem']}@{row['name']}",
-                            tag=tag.value,
-                            recursive=recursive.value,
-                        ).command,
-                        hosts=zfs_hosts.value,
+                    operation = zfs.SnapshotHold(
+                        name=f"{row['filesystem']}@{row['name']}",
+                        tag=tag.value,
+                        recursive=recursive.value,
+                    )
+                    tasks.extend(
+                        self._add_task(
+                            "hold",
+                            operation.command,
+                            hosts=zfs_hosts.value,
+                            filesystem=row["filesystem"],
+                            operation=operation,
+                        )
                     )
-                    if self._auto.value is True:
-                        for task in tasks:
-                            await self._run_task(task=task, spinner=self._spinner)
-                        await self.display_snapshots()
+                if self._auto.value is True:
+                    await self._run_tasks(tasks=tasks, spinner=self._spinner)
+                    await self.display_snapshots()
         self._set_selection()
 
     async def _release_snapshot(self):
@@ -261,87 +313,100 @@ class Manage(Tab):
             self._spinner.visible = True
             rows = await self._grid.get_selected_rows()
             if len(rows) > 0:
-                for row in rows:
-                    holds = await self.zfs.holds_for_snapshot(f"{row['filesystem']}@{row['name']}")
-                    for tag in holds.data:
-                        if tag not in all_tags:
-                            all_tags.append(tag)
+                holds = await self.zfs.holds_index([f"{row['filesystem']}@{row['name']}" for row in rows])
+                all_tags.extend(holds.data.keys())
                 if len(all_tags) > 0:
                     tags.update()
                     self._spinner.visible = False
                     result = await dialog
                     if result == "release":
                         if len(tags.value) > 0:
+                            tasks = []
                             for tag in tags.value:
-                                for row in rows:
-                                    tasks = self._add_task(
-                                        "release",
-                                        zfs.SnapshotRelease(
-                                            name=f"{row['filesystem']}@{row['name']}",
-                                            tag=tag,
-                                            recursive=recursive.value,
-                                        ).command,
-                                        hosts=zfs_hosts.value,
+                                held = holds.data.get(tag)
+                                for row in [row for row in rows if held is None or f"{row['filesystem']}@{row['name']}" in held]:
+                                    operation = zfs.SnapshotRelease(
+                                        name=f"{row['filesystem']}@{row['name']}",
+                                        tag=tag,
+                                        recursive=recursive.value,
+                                    )
+                                    tasks.extend(
+                                        self._add_task(
+                                            "release",
+                                            operation.command,
+                                            hosts=zfs_hosts.value,
+                                            filesystem=row["filesystem"],
+                                            operation=operation,
+                                        )
                                     )
-                                    if self._auto.value is True:
-                                        for task in tasks:
-                                            await self._run_task(task=task, spinner=self._spinner)
-                                        await self.display_snapshots()
+                            if self._auto.value is True:
+                                await self._run_tasks(tasks=tasks, spinner=self._spinner)
+                                await self.display_snapshots()
         self._spinner.visible = False
         self._set_selection()
 
-    def _update_task_status(self, timestamp, status, result=None):
+    def _update_task_status(self, timestamp, status, result=None, history=True):
         for task in self._tasks:
             if timestamp == task.timestamp:
                 task.status = status
                 if result is not None:
                     task.result = deepcopy(result)
-                    self.add_history(deepcopy(result))
+                    if history is True:
+                        self.add_history(deepcopy(result))
                 return task
 
-    async def _run_task(self, task: Task, spinner: el.Spinner):
+    async def _run_tasks(self, tasks: List[Task], spinner: el.Spinner, on_progress: Optional[Callable[[TaskExecutor], Any]] = None) -> TaskExecutor:
         spinner.visible = True
-        if task.status == "pending":
-            self._update_task_status(task.timestamp, "running")
-            result = await self.zfs.execute(task.command)
-            if result.stdout == "" and result.stderr == "":
-                status = "success"
-            else:
-                status = "error"
-            self._update_task_status(task.timestamp, status, result)
+        executor = TaskExecutor(
+            self._zfs,
+            lambda task, status, result, history: self._update_task_status(task.timestamp, status, result, history),
+            limit=self.common.get("concurrency", 1),
+            on_progress=on_progress,
+        )
+        await executor.run(tasks)
         spinner.visible = False
+        if executor.total > 1:
+            el.notify(f"Completed {executor.completed} tasks in {executor.elapsed:.1f}s ({executor.throughput:.1f}/s).", type="info")
+        return executor
 
     async def _display_tasks(self):
+        def show_progress(executor: TaskExecutor) -> None:
+            progress.text = executor.progress
+            tasks_grid.update()
+
+        def set_concurrency(value) -> None:
+            self.common.update({"concurrency": max(1, int(value or 1))})
+
         async def apply():
-            rows = await grid.get_selected_rows()
-            for row in rows:
-                task = Task(**row)
-                await self._run_task(task=task, spinner=spinner)
-                grid.update()
+            rows = await tasks_grid.get_selected_rows()
+            timestamps = [row["timestamp"] for row in rows]
+            tasks = [task for task in self._tasks if task.timestamp in timestamps]
+            await self._run_tasks(tasks=tasks, spinner=spinner, on_progress=show_progress)
+            tasks_grid.update()
 
         async def dry_run():
             spinner.visible = True
-            rows = await grid.get_selected_rows()
+            rows = await tasks_grid.get_selected_rows()
             for row in rows:
                 if row["status"] == "pending":
                     await zfs.Zfs().execute(row["command"])
             spinner.visible = False
 
         async def reset():
-            rows = await grid.get_selected_rows()
+            rows = await tasks_grid.get_selected_rows()
             for row in rows:
-                for grow in grid.options["rowData"]:
+                for grow in tasks_grid.options["rowData"]:
                     if row["command"] == grow.command:
                         grow.status = "pending"
-            grid.update()
+            tasks_grid.update()
 
         async def remove():
-            rows = await grid.get_selected_rows()
+            rows = await tasks_grid.get_selected_rows()
             for row in rows:
                 for task in self._tasks:
                     if row["timestamp"] == task.timestamp:
                         self._tasks.remove(task)
-            grid.update()
+            tasks_grid.update()
 
         async def display_result(e):
             if e.args["data"]["result"] is not None:
@@ -351,7 +416,7 @@ class Manage(Tab):
         with ui.dialog() as dialog, el.Card():
             with el.DBody(height="[80vh]", width="[80vw]"):
                 with el.WColumn().classes("col"):
-                    grid = ui.aggrid(
+                    tasks_grid = ui.aggrid(
                         {
                             "suppressRowClickSelection": True,
                             "rowSelection": "multiple",
@@ -397,10 +462,13 @@ class Manage(Tab):
                         },
                         theme="balham-dark",
                     ).on("cellClicked", lambda e: display_result(e))
-                    grid.tailwind().width("full").height("full")
-                    grid.call_api_method("selectAll")
+                    tasks_grid.tailwind().width("full").height("full")
+                    tasks_grid.call_api_method("selectAll")
                 with el.WRow() as row:
                     row.tailwind.height("[40px]")
+                    progress = ui.label().classes("text-secondary")
+                    concurrency = ui.number("Per Host", value=self.common.get("concurrency", 1), min=1, max=16, precision=0, on_change=lambda e: set_concurrency(e.value))
+                    concurrency.tailwind.width("20")
                     spinner = el.Spinner()
                     el.DButton("Apply", on_click=apply)
                     el.DButton("Dry Run", on_click=dry_run)
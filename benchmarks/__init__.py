@@ -0,0 +1,15 @@
+from typing import List
+import time
+
+
+def snapshot_lines(count: int, filesystems: int = 100) -> List[str]:
+    return [f"tank/fs{index % filesystems}@auto-{index:08d}\t{index * 4096}\t{1700000000 + index}\t{index % 3}\n" for index in range(count)]
+
+
+def best_of(function, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
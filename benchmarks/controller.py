@@ -0,0 +1,75 @@
+from typing import Awaitable, Callable, List
+import argparse
+import asyncio
+import contextlib
+import statistics
+import time
+from asyncio.subprocess import PIPE
+from bale.interfaces.cli import Cli
+
+
+class CountingLoop(asyncio.SelectorEventLoop):
+    iterations: int = 0
+
+    def _run_once(self) -> None:
+        self.iterations += 1
+        super()._run_once()
+
+
+async def polling_run(command: str, terminate: asyncio.Event) -> None:
+    process = await asyncio.create_subprocess_exec(*command.split(), stdout=PIPE, stderr=PIPE)
+    while process.returncode is None:
+        if terminate.is_set():
+            process.terminate()
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(process.wait(), 0.1)
+
+
+async def event_run(command: str, terminate: asyncio.Event) -> None:
+    cli = Cli()
+    task = asyncio.create_task(cli.execute(command))
+    await terminate.wait()
+    cli.terminate()
+    await task
+
+
+async def terminate_latency(run: Callable[[str, asyncio.Event], Awaitable[None]]) -> float:
+    terminate = asyncio.Event()
+    task = asyncio.create_task(run("sleep 10", terminate))
+    await asyncio.sleep(0.25)
+    start = time.perf_counter()
+    terminate.set()
+    await task
+    return time.perf_counter() - start
+
+
+def iterations(run: Callable[[str, asyncio.Event], Awaitable[None]]) -> int:
+    loop = CountingLoop()
+    try:
+        loop.run_until_complete(run("sleep 1", asyncio.Event()) if run is polling_run else Cli().execute("sleep 1"))
+        return loop.iterations
+    finally:
+        loop.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure command supervision latency and event loop wakeups.")
+    parser.add_argument("--runs", type=int, default=100)
+    args = parser.parse_args()
+
+    async def latencies() -> List[float]:
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            await Cli().execute("true")
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    print(f"'true' end to end: {statistics.median(asyncio.run(latencies())) * 1000:.1f} ms median over {args.runs} runs")
+    for name, run in [("polling", polling_run), ("events", event_run)]:
+        latency = statistics.median([asyncio.run(terminate_latency(run)) for _ in range(5)])
+        print(f"{name}: terminate to return {latency * 1000:.1f} ms, {iterations(run)} loop iterations for 'sleep 1'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+from typing import Any, Callable
+import argparse
+import gc
+import tracemalloc
+from benchmarks import snapshot_lines
+from benchmarks.parse import regex_parse
+from bale.interfaces import zfs
+
+
+def allocated(build: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare memory held by dict snapshots and SnapshotRecord objects.")
+    parser.add_argument("--snapshots", type=int, default=100000)
+    args = parser.parse_args()
+    lines = snapshot_lines(args.snapshots)
+    dicts = allocated(lambda: regex_parse(lines))
+    records = allocated(lambda: zfs.Zfs()._parse_snapshots(lines))
+    print(f"{args.snapshots} snapshots: dicts {dicts / 1e6:.1f} MB ({dicts / args.snapshots:.0f} B each), records {records / 1e6:.1f} MB ({records / args.snapshots:.0f} B each)")
+
+
+if __name__ == "__main__":
+    main()
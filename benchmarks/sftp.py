@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+import asyncssh
+from bale.interfaces.sshdl import Reader
+
+
+class OpenServer(asyncssh.SSHServer):
+    def begin_auth(self, username: str) -> bool:
+        return False
+
+
+def slow_sftp(latency: float, max_read: int):
+    class SlowSFTPServer(asyncssh.SFTPServer):
+        async def read(self, file_obj, offset, size):
+            await asyncio.sleep(latency)
+            return super().read(file_obj, offset, min(size, max_read))
+
+    return SlowSFTPServer
+
+
+async def sequential(sftp: asyncssh.SFTPClient, path: str, block_size: int = 65536) -> bytes:
+    digest = hashlib.sha256()
+    offset = 0
+    async with sftp.open(path, "rb", encoding=None, block_size=0) as remote_file:
+        while True:
+            data = await remote_file.read(block_size, offset)
+            if not data:
+                break
+            digest.update(data)
+            offset += len(data)
+    return digest.digest()
+
+
+async def pipelined(sftp: asyncssh.SFTPClient, path: str) -> bytes:
+    digest = hashlib.sha256()
+    async for data in Reader(sftp, path):
+        digest.update(data)
+    return digest.digest()
+
+
+async def run(size: int, latency: float, max_read: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        key_path = os.path.join(directory, "id_ed25519")
+        asyncssh.generate_private_key("ssh-ed25519").write_private_key(key_path)
+        server = await asyncssh.listen(
+            "127.0.0.1", 0, server_host_keys=[asyncssh.generate_private_key("ssh-ed25519")], server_factory=OpenServer, sftp_factory=slow_sftp(latency, max_read)
+        )
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async with asyncssh.connect("127.0.0.1", port, username="user", client_keys=[key_path], known_hosts=None) as connection:
+                async with connection.start_sftp_client() as sftp:
+                    digests = []
+                    for name, read in [("sequential", sequential), ("pipelined", pipelined)]:
+                        start = time.perf_counter()
+                        digests.append(await read(sftp, path))
+                        elapsed = time.perf_counter() - start
+                        print(f"{name}: {size / elapsed / 1e6:.1f} MB/s")
+                    assert digests[0] == digests[1]
+        finally:
+            server.close()
+            await server.wait_closed()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare one-at-a-time SFTP reads with the pipelined Reader over loopback.")
+    parser.add_argument("--size", type=int, default=64, help="file size in MiB")
+    parser.add_argument("--latency", type=float, default=5, help="added latency per read in ms")
+    parser.add_argument("--max-read", type=int, default=262144, help="largest read the server answers in bytes")
+    args = parser.parse_args()
+    print(f"{args.size} MiB, {args.latency} ms per read, reads capped at {args.max_read} bytes")
+    asyncio.run(run(args.size * 1048576, args.latency / 1000, args.max_read))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import asyncio
+import os
+from bale.interfaces import catalog, cli
+from bale.interfaces.zfs import SnapshotRecord
+from bale.result import Result
+
+
+class FakeZfs(cli.Cli):
+    host = "fake"
+
+    def __init__(self, root, snapshots, diffs=None) -> None:
+        super().__init__(max_concurrent=4)
+        self.root = str(root)
+        self.names = snapshots
+        self.diffs = diffs or {}
+
+    @property
+    async def snapshots(self):
+        records = [SnapshotRecord(filesystem="tank", name=name, used_bytes=0, creation=index, userrefs=0) for index, name in enumerate(self.names)]
+        return Result(data={f"tank@{record.name}": record for record in records})
+
+    @property
+    async def filesystems(self):
+        return Result(data={"tank": {"mountpoint": self.root}})
+
+    def stream(self, command, max_output_lines=0, timeout=None):
+        if command.startswith("zfs diff"):
+            previous, snapshot = [argument.split("@")[1] for argument in command.split()[3:]]
+            lines = "".join(f"1\t{line}\n" for line in self.diffs[(previous, snapshot)]).replace("ROOT", self.root)
+            command = f"printf '%s' '{lines}'"
+        return cli.Stream(self, command, lambda: asyncio.create_subprocess_shell(command, stdout=-1, stderr=-1))
+
+
+def write(root, snapshot, files):
+    for path, content in files.items():
+        path = os.path.join(root, ".zfs", "snapshot", snapshot, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+
+async def search(c, pattern):
+    rows = []
+    async for batch in c.iter_search("tank", pattern):
+        rows.extend(batch)
+    return sorted((row["relative"], row["first_snapshot"], row["last_snapshot"]) for row in rows)
+
+
+def test_directory_rename_moves_subtree(tmp_path):
+    root = tmp_path / "tank"
+    write(root, "s1", {"docs/a.txt": "a", "docs/sub/b.txt": "b", "top.txt": "t"})
+    write(root, "s2", {"papers/a.txt": "a", "papers/sub/b.txt": "b", "top.txt": "t"})
+    zfs = FakeZfs(root, ["s1", "s2"], {("s1", "s2"): ["R\t/\tROOT/docs\tROOT/papers", "M\t/\tROOT/"]})
+    c = catalog.Catalog(zfs, path=str(tmp_path / "data"))
+
+    async def run():
+        result = await c.update("tank")
+        return result, await search(c, "*.txt")
+
+    result, rows = asyncio.run(run())
+    assert result.data == 2
+    assert rows == [
+        ("docs/a.txt", "s1", "s1"),
+        ("docs/sub/b.txt", "s1", "s1"),
+        ("papers/a.txt", "s2", "s2"),
+        ("papers/sub/b.txt", "s2", "s2"),
+        ("top.txt", "s1", "s2"),
+    ]
+
+
+def test_failed_baseline_is_rolled_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog.el, "notify", lambda *args, **kwargs: None)
+    root = tmp_path / "tank"
+    zfs = FakeZfs(root, ["s1"])
+    c = catalog.Catalog(zfs, path=str(tmp_path / "data"))
+    result = asyncio.run(c.update("tank"))
+    assert result.data == 0
+    write(root, "s1", {"a.txt": "a"})
+    result = asyncio.run(c.update("tank"))
+    assert result.data == 1
+    assert asyncio.run(search(c, "*")) == [("a.txt", "s1", "s1")]
+
+
+class FakeCatalog:
+    host = "fake"
+
+    async def update(self, filesystem):
+        return Result()
+
+    async def iter_search(self, filesystem, pattern):
+        for index in range(100):
+            yield [{"relative": f"{filesystem}/{index}", "bytes": 0, "modified_timestamp": 0, "snapshots": 1}]
+
+
+def test_search_all_stops_producer_when_consumer_leaves():
+    async def run():
+        targets = [(FakeCatalog(), f"tank/{index}") for index in range(4)]
+        batches = catalog.search_all(targets, "*", per_host=1)
+        async for _ in batches:
+            break
+        await asyncio.sleep(0.1)
+        await batches.aclose()
+        await asyncio.sleep(0.1)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
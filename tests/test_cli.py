@@ -0,0 +1,115 @@
+import asyncio
+import gzip
+from bale.interfaces.cli import Cli, Fanout
+
+
+def test_execute_truncates_without_hanging(caplog):
+    result = asyncio.run(asyncio.wait_for(Cli().execute("seq 100000", max_output_lines=10), 30))
+    assert "killing" not in caplog.text
+    assert result.truncated is True
+    assert result.timed_out is False
+    assert len(result.stdout_lines) == 11
+
+
+def test_execute_truncates_shell_ignoring_terminate():
+    cli = Cli()
+    cli.kill_timeout = 0.5
+    result = asyncio.run(asyncio.wait_for(cli.shell("trap '' TERM; seq 100000; sleep 30", max_output_lines=10), 30))
+    assert result.truncated is True
+    assert cli.is_busy is False
+
+
+def test_stream_break_releases_slot():
+    async def run():
+        cli = Cli(max_concurrent=1)
+        for _ in range(3):
+            async with cli.stream("seq 100000") as stream:
+                async for line in stream:
+                    if line.strip() == "10":
+                        break
+            assert stream.result is not None
+            assert stream.result.terminated is True
+        assert cli.is_busy is False
+        return await cli.execute("echo done")
+
+    result = asyncio.run(asyncio.wait_for(run(), 30))
+    assert result.stdout_lines == ["done\n"]
+
+
+def test_stream_cancel_releases_slot():
+    async def consume(stream):
+        async with stream:
+            async for _ in stream:
+                await asyncio.sleep(0.01)
+
+    async def run():
+        cli = Cli(max_concurrent=1)
+        stream = cli.stream("seq 100000")
+        task = asyncio.create_task(consume(stream))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert stream.result is not None
+        assert cli.is_busy is False
+        return await cli.execute("echo done")
+
+    result = asyncio.run(asyncio.wait_for(run(), 30))
+    assert result.stdout_lines == ["done\n"]
+
+
+def test_stream_keeps_stderr_tail():
+    async def run():
+        stream = Cli().stream("ls " + " ".join(f"/nonexistent-{i}" for i in range(50)))
+        async with stream:
+            async for _ in stream:
+                pass
+        return stream.result
+
+    result = asyncio.run(asyncio.wait_for(run(), 30))
+    assert result.return_code != 0
+    assert len(result.stderr_lines) == 50
+
+
+class FakeTerminal:
+    def __init__(self) -> None:
+        self.frames = []
+
+    def call_terminal_method(self, name, frame):
+        self.frames.append(frame)
+
+
+def test_fanout_backlog_is_capped():
+    fanout = Fanout()
+    terminal = FakeTerminal()
+    fanout.add(terminal, ["prefix\n"] + [f"{index}\n" for index in range(100000)])
+    lines = "".join(terminal.frames).splitlines()
+    assert len(lines) == fanout.max_backlog_lines + 1
+    assert lines[0] == "prefix"
+    assert lines[-1] == "99999"
+    assert "lines omitted" in lines[fanout.max_backlog_lines // 2]
+
+
+def test_terminate_does_not_wait_for_orphaned_children():
+    async def run():
+        cli = Cli()
+        task = asyncio.create_task(cli.shell("sleep 10; true"))
+        await asyncio.sleep(0.25)
+        cli.terminate()
+        return await asyncio.wait_for(task, 3)
+
+    result = asyncio.run(run())
+    assert result.terminated is True
+
+
+def test_execute_spills_full_output_and_prunes_logs(tmp_path):
+    cli = Cli()
+    cli.capture_lines = 10
+    cli.log_dir = str(tmp_path)
+    cli.log_keep = 2
+    for _ in range(3):
+        result = asyncio.run(cli.execute("seq 2500"))
+    logs = list(tmp_path.glob("*.log.gz"))
+    assert len(logs) == 2
+    assert len(result.stdout_lines) == 11
+    with gzip.open(result.log_path, "rt", encoding="utf-8") as log:
+        assert log.read().splitlines() == [str(n) for n in range(1, 2501)]
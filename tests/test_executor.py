@@ -0,0 +1,87 @@
+import asyncio
+import os
+import stat
+from bale import executor
+from bale.interfaces import cli
+from bale.interfaces.zfs import SnapshotDestroy
+from bale.tabs import Task
+
+FAKE_ZFS = """#!/bin/sh
+# destroy is atomic: any held snapshot fails the whole list
+case "$*" in
+    *held*) echo "cannot destroy snapshot ${2%%@*}@held: dataset is busy"; exit 1 ;;
+esac
+exit 0
+"""
+
+
+class FakeConnection(cli.Cli):
+    def __init__(self) -> None:
+        super().__init__()
+        self.commands = []
+
+    async def execute(self, command, max_output_lines=0, timeout=None):
+        self.commands.append(command)
+        return await self.shell(command)
+
+    def invalidate_snapshots(self, filesystem=None):
+        pass
+
+
+def test_failed_batch_is_attributed_per_snapshot(tmp_path, monkeypatch):
+    zfs = tmp_path / "zfs"
+    zfs.write_text(FAKE_ZFS)
+    zfs.chmod(zfs.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(executor.el, "notify", lambda *args, **kwargs: None)
+    connection = FakeConnection()
+    tasks = []
+    for snapshot in ["a", "held", "c"]:
+        operation = SnapshotDestroy(name=f"tank/fs@{snapshot}")
+        tasks.append(Task(action="destroy", command=operation.command, status="pending", host="host", filesystem="tank/fs", operation=operation))
+    updates = {}
+
+    def on_update(task, status, result, history):
+        updates[task.operation.snapshot] = (status, result)
+
+    asyncio.run(executor.TaskExecutor({"host": connection}, on_update).run(tasks))
+    assert connection.commands[0] == "zfs destroy  tank/fs@a,held,c"
+    assert len(connection.commands) == 2
+    assert updates["a"][0] == "success"
+    assert updates["c"][0] == "success"
+    assert updates["held"][0] == "error"
+    assert "held" in updates["held"][1].stdout
+    assert updates["held"][1].command == "zfs destroy  tank/fs@held"
+
+
+def test_slot_is_capped_without_touching_connection():
+    connection = FakeConnection()
+    connection.max_concurrent = 8
+    task_executor = executor.TaskExecutor({"host": connection}, lambda *args: None, limit=16)
+    slot = task_executor._slot("host")
+    assert slot._value == executor.max_sessions - 8
+    assert connection.max_concurrent == 8
+
+
+class OverlapConnection(FakeConnection):
+    def __init__(self) -> None:
+        super().__init__()
+        self.running = 0
+        self.overlap = 0
+
+    async def execute(self, command, max_output_lines=0, timeout=None):
+        self.running += 1
+        self.overlap = max(self.overlap, self.running)
+        try:
+            return await super().execute(command, max_output_lines, timeout)
+        finally:
+            self.running -= 1
+
+
+def test_tasks_in_one_pool_do_not_race():
+    connection = OverlapConnection()
+    connection.max_concurrent = 4
+    tasks = [Task(action="destroy", command="sleep 0.2", status="pending", host="host", filesystem=filesystem) for filesystem in ["tank", "tank/fs", "tank/fs/child"]]
+    asyncio.run(executor.TaskExecutor({"host": connection}, lambda *args: None, limit=4, max_script_length=1).run(tasks))
+    assert connection.overlap == 1
+    assert connection.commands == ["sleep 0.2"] * 3
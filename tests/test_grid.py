@@ -0,0 +1,52 @@
+import asyncio
+import json
+from bale import grid
+
+
+class FakeClient:
+    def __init__(self, id: str) -> None:
+        self.id = id
+        self.handlers = []
+
+    def on_disconnect(self, handler) -> None:
+        self.handlers.append(handler)
+
+
+def test_sources_are_per_client():
+    a, b = FakeClient("a"), FakeClient("b")
+    rows_a = [{"name": f"a{i}", "size": i} for i in range(300)]
+    rows_b = [{"name": f"b{i}", "size": i} for i in range(10)]
+    source_a = grid.register_source("snapshots-host", lambda: rows_a, client=a)
+    source_b = grid.register_source("snapshots-host", lambda: rows_b, client=b)
+    assert source_a != source_b
+
+    async def fetch(source, **params):
+        return await grid.grid_rows(source, **params)
+
+    async def run():
+        sort = json.dumps([{"colId": "size", "sort": "desc"}])
+        return await asyncio.gather(fetch(source_a, start=0, end=100, sort=sort), fetch(source_b, start=0, end=100), fetch(source_a, start=100, end=200, sort=sort))
+
+    first, second, third = asyncio.run(run())
+    assert first["lastRow"] == 300 and first["rows"][0]["name"] == "a299"
+    assert third["rows"][0]["name"] == "a199"
+    assert second["lastRow"] == 10 and second["rows"][0]["name"] == "b0"
+
+    for handler in a.handlers:
+        handler()
+    assert source_a not in grid.sources
+    assert source_b in grid.sources
+    grid.unregister_source(source_b)
+    assert source_b not in grid.sources
+
+
+def test_view_is_cached_until_invalidated():
+    client = FakeClient("c")
+    rows = [{"name": "x", "size": 1}]
+    source = grid.register_source("find", lambda: rows, client=client)
+    assert asyncio.run(grid.grid_rows(source))["lastRow"] == 1
+    rows.append({"name": "y", "size": 2})
+    assert asyncio.run(grid.grid_rows(source))["lastRow"] == 1
+    grid.invalidate_source(source)
+    assert asyncio.run(grid.grid_rows(source))["lastRow"] == 2
+    grid.unregister_source(source)
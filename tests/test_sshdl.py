@@ -0,0 +1,68 @@
+import asyncio
+import contextlib
+import gzip
+import io
+import tarfile
+import asyncssh
+import pytest
+from bale.interfaces import sshdl
+
+
+class LocalZfs:
+    host = "local"
+
+    @contextlib.asynccontextmanager
+    async def sftp(self, browse=False):
+        yield self
+
+    async def stat(self, path):
+        raise asyncssh.SFTPNoSuchFile(f"{path} not found")
+
+    async def create_remote_process(self, command):
+        return await asyncio.create_subprocess_shell(command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+
+
+async def archive(paths):
+    return b"".join([chunk async for chunk in sshdl.remote_archive_blocks(LocalZfs(), paths, compression="gzip")])
+
+
+def test_remote_archive(tmp_path):
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "dir" / "file").write_bytes(b"data")
+    data = asyncio.run(archive([str(tmp_path / "dir")]))
+    with tarfile.open(fileobj=io.BytesIO(gzip.decompress(data))) as tar:
+        assert tar.extractfile("dir/file").read() == b"data"
+
+
+def test_remote_archive_reports_tar_failure(tmp_path):
+    with pytest.raises(OSError, match="tar 2"):
+        asyncio.run(archive([str(tmp_path / "missing")]))
+
+
+def test_parse_range():
+    assert sshdl.parse_range("bytes=0-9", 100) == (0, 9)
+    assert sshdl.parse_range("bytes=90-", 100) == (90, 99)
+    assert sshdl.parse_range("bytes=-10", 5) == (0, 4)
+    assert sshdl.parse_range("bytes=50-500", 100) == (50, 99)
+    assert sshdl.parse_range("items=0-1", 100) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=", "bytes=-", "bytes=a-9", "bytes=0-x", "bytes=9-0", "bytes=--5", "bytes= 1 - 2"])
+def test_parse_range_ignores_invalid(header):
+    assert sshdl.parse_range(header, 100) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=-10", "bytes=0-", "bytes=0-0", "bytes=-0"])
+def test_parse_range_empty_file(header):
+    with pytest.raises(ValueError):
+        sshdl.parse_range(header, 0)
+
+
+def test_serve_missing_file():
+    response = asyncio.run(sshdl.serve_file(LocalZfs(), "/missing", "missing", None))
+    assert response.status_code == 404
+
+
+def test_parse_range_unsatisfiable():
+    with pytest.raises(ValueError):
+        sshdl.parse_range("bytes=100-", 100)
@@ -0,0 +1,150 @@
+import asyncio
+import asyncssh
+from bale.interfaces import sshpool
+
+
+class LimitedServer(asyncssh.SSHServer):
+    def __init__(self, connections, handle) -> None:
+        self._connections = connections
+        self._handle = handle
+        self._sessions = 0
+
+    def connection_made(self, conn) -> None:
+        self._connections.append(conn)
+
+    def begin_auth(self, username: str) -> bool:
+        return False
+
+    def session_requested(self):
+        if self._sessions >= 1:
+            raise asyncssh.ChannelOpenError(asyncssh.OPEN_ADMINISTRATIVELY_PROHIBITED, "too many sessions")
+        self._sessions += 1
+        return asyncssh.SSHServerProcess(self._handle, None, 3, False)
+
+
+def test_channel_limit_keeps_pooled_connection(tmp_path):
+    async def run():
+        release = asyncio.Event()
+        connections = []
+
+        async def handle(process):
+            if process.command == "hold":
+                await release.wait()
+            process.stdout.write(f"{process.command}\n")
+            process.exit(0)
+
+        key_path = str(tmp_path / "id_rsa")
+        asyncssh.generate_private_key("ssh-ed25519").write_private_key(key_path)
+        server = await asyncssh.listen("127.0.0.1", 0, server_host_keys=[asyncssh.generate_private_key("ssh-ed25519")], server_factory=lambda: LimitedServer(connections, handle))
+        port = server.sockets[0].getsockname()[1]
+        try:
+            held = await sshpool.create_process("pool-test", "127.0.0.1", "user", key_path, "hold", port=port)
+            pooled = sshpool._connections["pool-test"]
+            extra = await sshpool.create_process("pool-test", "127.0.0.1", "user", key_path, "echo", port=port)
+            assert await extra.stdout.readline() == b"echo\n"
+            assert await extra.wait() == 0
+            assert sshpool._connections["pool-test"] is pooled
+            assert len(connections) == 2
+            release.set()
+            assert await held.stdout.readline() == b"hold\n"
+            assert await held.wait() == 0
+        finally:
+            sshpool.close("pool-test")
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+
+
+class OpenServer(asyncssh.SSHServer):
+    def begin_auth(self, username: str) -> bool:
+        return False
+
+
+def test_browse_does_not_wait_for_transfer_slots(tmp_path, monkeypatch):
+    monkeypatch.setattr(sshpool, "sftp_max_sessions", 1)
+    (tmp_path / "file").write_bytes(b"data")
+
+    async def run():
+        key_path = str(tmp_path / "id_rsa")
+        asyncssh.generate_private_key("ssh-ed25519").write_private_key(key_path)
+        server = await asyncssh.listen("127.0.0.1", 0, server_host_keys=[asyncssh.generate_private_key("ssh-ed25519")], server_factory=OpenServer, sftp_factory=True)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async with sshpool.sftp("browse-test", "127.0.0.1", "user", key_path, port=port):
+                async with sshpool.sftp("browse-test", "127.0.0.1", "user", key_path, port=port, browse=True) as sftp:
+                    names = await asyncio.wait_for(sftp.listdir(str(tmp_path)), 5)
+            assert "file" in names
+        finally:
+            sshpool.close("browse-test")
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+
+
+def test_idle_browse_session_expires(tmp_path, monkeypatch):
+    monkeypatch.setattr(sshpool, "sftp_idle_timeout", 0.1)
+
+    async def run():
+        key_path = str(tmp_path / "id_rsa")
+        asyncssh.generate_private_key("ssh-ed25519").write_private_key(key_path)
+        server = await asyncssh.listen("127.0.0.1", 0, server_host_keys=[asyncssh.generate_private_key("ssh-ed25519")], server_factory=OpenServer, sftp_factory=True)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async with sshpool.sftp("browse-idle-test", "127.0.0.1", "user", key_path, port=port, browse=True) as sftp:
+                await asyncio.sleep(0.2)
+                await sftp.listdir(str(tmp_path))
+                assert "browse-idle-test" in sshpool._sftp_browse
+            await asyncio.sleep(0.2)
+            assert "browse-idle-test" not in sshpool._sftp_browse
+            assert sshpool.stats["browse-idle-test"]["sftp_expired"] == 1
+        finally:
+            sshpool.close("browse-idle-test")
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+
+
+def test_connection_errors_become_failed_processes(tmp_path):
+    async def run():
+        key_path = str(tmp_path / "id_rsa")
+        asyncssh.generate_private_key("ssh-ed25519").write_private_key(key_path)
+        server = await asyncssh.listen("127.0.0.1", 0, server_host_keys=[asyncssh.generate_private_key("ssh-ed25519")], server_factory=OpenServer)
+        port = server.sockets[0].getsockname()[1]
+        server.close()
+        await server.wait_closed()
+        process = await sshpool.create_process("refused-test", "127.0.0.1", "user", key_path, "true", port=port)
+        missing = await sshpool.create_process("missing-key-test", "127.0.0.1", "user", str(tmp_path / "missing"), "true", port=port)
+        return process, await process.stderr.read(), await process.wait(), await missing.wait()
+
+    process, stderr, returncode, missing = asyncio.run(run())
+    assert isinstance(process, sshpool.FailedProcess)
+    assert b"refused-test" in stderr
+    assert returncode == 255
+    assert missing == 255
+
+
+def test_connect_reads_ssh_config(tmp_path):
+    async def run():
+        key_path = str(tmp_path / "id_rsa")
+        asyncssh.generate_private_key("ssh-ed25519").write_private_key(key_path)
+
+        async def handle(process):
+            process.stdout.write("ok\n")
+            process.exit(0)
+
+        server = await asyncssh.listen("127.0.0.1", 0, server_host_keys=[asyncssh.generate_private_key("ssh-ed25519")], server_factory=OpenServer, process_factory=handle)
+        port = server.sockets[0].getsockname()[1]
+        config = tmp_path / "config"
+        config.write_text(f"Host alias-test\n    HostName 127.0.0.1\n    ControlMaster auto\n    ControlPath {tmp_path}/%C\n")
+        try:
+            process = await sshpool.create_process("alias-test", "", "user", key_path, "true", port=port, config_path=str(config))
+            return await process.stdout.readline(), await process.wait()
+        finally:
+            sshpool.close("alias-test")
+            server.close()
+            await server.wait_closed()
+
+    assert asyncio.run(run()) == (b"ok\n", 0)
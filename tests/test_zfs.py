@@ -0,0 +1,100 @@
+import asyncio
+from asyncio.subprocess import PIPE
+from bale.interfaces import cli, zfs
+from bale.result import Result
+
+OUTPUT = {
+    "zfs holds": ["tank/fs@a\tkeep\tThu Jan  1 00:00 1970\n"],
+    "zfs get -Hp -t": ["tank/fs\ttype\tfilesystem\t-\n", "tank/fs\tmountpoint\t/tank/fs\tdefault\n", "tank/fs\tused\t1024\t-\n"],
+    "zfs get -Hp -s local": ["tank/fs\tcompression\tlz4\tlocal\n", "tank/fs\tbale:auto\ttrue\tlocal\n"],
+}
+
+
+class FakeZfs(zfs.Zfs):
+    def __init__(self) -> None:
+        super().__init__()
+        self.commands = []
+
+    async def execute(self, command, max_output_lines=0, notify=True):
+        self.commands.append(command)
+        await asyncio.sleep(0.01)
+        lines = next(lines for prefix, lines in OUTPUT.items() if command.startswith(prefix))
+        return Result(command=command, stdout_lines=lines)
+
+
+def test_concurrent_holds_for_snapshot():
+    async def shared():
+        fake = FakeZfs()
+        return await asyncio.gather(*[fake.holds_for_snapshot("tank/fs@a") for _ in range(3)])
+
+    results = asyncio.run(shared())
+    assert [result.data for result in results] == [["keep"]] * 3
+
+
+def test_properties_fetch_only_what_is_read():
+    fake = FakeZfs()
+    result = asyncio.run(fake.properties())
+    assert all(command.endswith("all") == ("-s local" in command) for command in fake.commands)
+    assert result.data.get("tank/fs", "mountpoint") == "/tank/fs"
+    assert result.data.get("tank/fs", "compression") is None
+    assert asyncio.run(fake.filesystems_with_prop("bale:auto")).data == ["tank/fs"]
+
+
+class FakeInventory(cli.Cli, zfs.Zfs):
+    def __init__(self) -> None:
+        cli.Cli.__init__(self, max_concurrent=4)
+        zfs.Zfs.__init__(self)
+        self.responses = {}
+
+    def _command(self, command):
+        for prefix, (output, code) in self.responses.items():
+            if command.startswith(prefix):
+                return f"printf '{output}'; exit {code}"
+        raise AssertionError(command)
+
+    async def execute(self, command, max_output_lines=0, notify=True):
+        return await self.shell(self._command(command))
+
+    def stream(self, command, max_output_lines=0, timeout=None):
+        shell = self._command(command)
+        return cli.Stream(self, shell, lambda: asyncio.create_subprocess_shell(shell, stdout=PIPE, stderr=PIPE), max_output_lines, timeout)
+
+
+def test_failed_listing_keeps_inventory_state(monkeypatch):
+    monkeypatch.setattr(zfs.el, "notify", lambda *args, **kwargs: None)
+    fake = FakeInventory()
+
+    async def refresh():
+        fake.invalidate_query("snapshots")
+        return await fake.snapshots
+
+    fake.responses = {"zfs get": ("tank\\t1\\n", 0), "zfs list": ("tank@a\\t0\\t1\\t0\\n", 0)}
+    assert list(asyncio.run(refresh()).data) == ["tank@a"]
+    fake.responses = {"zfs get": ("tank\\t2\\n", 0), "zfs list": ("", 1)}
+    result = asyncio.run(refresh())
+    assert result.return_code == 1
+    assert list(result.data) == ["tank@a"]
+    fake.responses = {"zfs get": ("tank\\t2\\n", 0), "zfs list": ("tank@a\\t0\\t1\\t0\\ntank@b\\t0\\t2\\t0\\n", 0)}
+    assert list(asyncio.run(refresh()).data) == ["tank@a", "tank@b"]
+
+
+def test_transient_failure_keeps_incremental_refresh(monkeypatch):
+    monkeypatch.setattr(zfs.el, "notify", lambda *args, **kwargs: None)
+    fake = FakeInventory()
+    fake.responses = {"zfs get": ("", 255)}
+    result = asyncio.run(fake.snapshots)
+    assert result.return_code == 255
+    assert fake.inventory_supported is True
+
+
+def test_holds_index_for_selection():
+    class Holds(FakeZfs):
+        async def execute(self, command, max_output_lines=0, notify=True):
+            self.commands.append(command)
+            lines = ["tank/fs@a\tkeep\t-\n", "tank/fs@a\tbackup\t-\n", "tank/fs@b\tkeep\t-\n"]
+            return Result(command=command, stdout_lines=[line for line in lines if line.split("\t")[0] in command.split()])
+
+    fake = Holds()
+    result = asyncio.run(fake.holds_index(["tank/fs@b"]))
+    assert result.data == {"keep": ["tank/fs@b"]}
+    assert fake.commands == ["zfs holds -H -r tank/fs@b"]